@@ -0,0 +1,81 @@
+'''
+Runs the AI's work on a background thread, so a slow AI does not freeze the UI.
+Does not import Tk: results are collected by the UI thread with poll(), such as from an after() loop.
+'''
+
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+
+class AIWorker(object):
+    '''Background thread running jobs one at a time, in the order they were submitted.
+    A job may rely on the jobs submitted before it having run.
+
+    Below are data representations:
+        * _jobs:
+            queue of (job, callback) waiting to run, None to stop the thread
+        * _done:
+            queue of (callback, result, exception info or None) of finished jobs, for poll()
+    '''
+
+    def __init__(self):
+        '''Create a worker, and start its thread.'''
+
+        self._jobs = queue.Queue()
+        self._done = queue.Queue()
+
+        self._thread = threading.Thread(target=self._run, name="AIWorker")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, job, callback=None):
+        '''Queue <job>() to run on the thread.
+        <callback>(result) is called by poll() once the job has run.'''
+
+        self._jobs.put((job, callback))
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                self._jobs.task_done()
+                return
+
+            job, callback = item
+            try:
+                result = job()
+                exc_info = None
+            except Exception:
+                result = None
+                exc_info = sys.exc_info()
+
+            self._done.put((callback, result, exc_info))
+            self._jobs.task_done()
+
+    def poll(self):
+        '''Call the callbacks of the jobs finished since the last call. Call this from the UI thread.
+        An exception raised by a job is raised again here.'''
+
+        while True:
+            try:
+                callback, result, exc_info = self._done.get_nowait()
+            except queue.Empty:
+                return
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            if callback is not None:
+                callback(result)
+
+    def wait(self):
+        '''Wait until every queued job has run. Their callbacks are left for poll().'''
+
+        self._jobs.join()
+
+    def close(self):
+        '''Run the queued jobs, then stop the thread.'''
+
+        self._jobs.put(None)
+        self._thread.join()
@@ -12,12 +12,13 @@ try:
 except ImportError:
     from tkinter import messagebox as tkMessageBox
 
-from six.moves.tkinter import Tk, BOTH, CURRENT, DISABLED
+from six.moves.tkinter import Tk, BOTH, CURRENT
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
+import argparse
+import atexit
 import uuid
-# import time
-import random
+import time
 import json
 import os
 
@@ -26,6 +27,13 @@ from ship_model import Ship, ShipLoader
 # from ship_ai import ShipAI
 import mock1
 from player_controller import PlayerController
+from instrumentation import REGISTRY, instrument, start_tracing
+from game_journal import GameJournal, SUFFIX as JOURNAL_SUFFIX, replay
+from save_writer import SaveWriter
+from game_id import GameIdAllocator
+from ai_worker import AIWorker
+from game_client import GameClient
+from rules import Rules
 
 class GameController(object):
     '''
@@ -40,10 +48,21 @@ class GameController(object):
             - simulate events
         '''
     DEV_FLAG = True
+    
+    ''' set this to True to record time, call counts and allocations (Python 3 only) of each phase of a turn
+        The registry is dumped at exit, or on demand from the dev menu'''
+    INSTRUMENT_FLAG = False
     #####################################
     
     ############ delays #################
+    # least time between two shots shown during the AI's turn, in seconds
     AI_SHOT_DELAY = 1.0
+    # how often to check for AI shots computed in the background, in ms
+    AI_POLL_DELAY = 10
+    # how often to check for lines from the game server, in ms
+    SERVER_POLL_DELAY = 20
+    # how often to check for saves finished in the background, in ms
+    SAVE_POLL_DELAY = 100
     #####################################
     
     ############ players ################
@@ -57,6 +76,10 @@ class GameController(object):
     AUTOSAVE_DIR = os.path.join(SAVE_DIR, "autosaves")
     DEFAULT_SAVE_FILE = "battleship.json"
     DEFAULT_LOAD_FILE = DEFAULT_SAVE_FILE
+    # the journal of a game is compacted into one snapshot after this many events
+    JOURNAL_COMPACT_EVERY = 100
+    # JSON indent of save files, None for compact files
+    SAVE_INDENT = 4
     #####################################
     
     ########## Key Game Files ###########
@@ -84,23 +107,19 @@ class GameController(object):
             fp.close()
     
     def _create_game_id(self):
-        '''Create a unique game ID for this game. Update relevant file.'''
+        '''Create a unique game ID for this game, even if other games are running at the same time.'''
         
-        fname = os.path.join(GameController.CONF_DIR, GameController.ID_FILE)
-        fp = open(fname, "r")
-        self._game_id = int("0" + fp.read().strip()) + 1 # leading 0 makes game_id = 0 when file is empty
-        fp.close()
-        
-        fp = open(fname, "w")
-        fp.write(str(self._game_id))
-        fp.close()
+        self._game_id = self._game_ids.next_id()
 
-    def __init__(self): 
+    def __init__(self, server=None): 
         '''Create a main controller for the game.
-        Create the GUI. Run the game.'''
+        Create the GUI. Run the game.
+        <server> is the (host, port) of a game server (see game_server.py) whose AI to play against,
+        None to play against the AI on this computer.'''
         
         self._set_cwd()
         self._game_files_setup()
+        self._game_ids = GameIdAllocator(os.path.join(GameController.CONF_DIR, GameController.ID_FILE))
 
         # create the UI
         app = Tk()
@@ -111,6 +130,28 @@ class GameController(object):
         self.game_frame.grab_set()
         self.game_frame.focus_set()
         
+        # saves are written in the background, and any left are written at exit
+        self._save_writer = SaveWriter(indent=GameController.SAVE_INDENT)
+        atexit.register(self._save_writer.close)
+        self._poll_saves()
+        
+        # the AI picks its shots in the background, they are shown by _poll_ai
+        self._ai_worker = AIWorker()
+        self._ai_turn = 0
+        self._ai_playing = False
+        self._ai_after_id = None
+        self._last_shot_time = 0
+        self._poll_ai()
+        
+        # on a server, the server plays the opponent, and the lines it sends are handled by _poll_server
+        self._client = None
+        self._server_lines = deque()
+        self._server_game = None
+        self._awaiting_server = False
+        if server is not None:
+            self._client = GameClient(*server)
+            self._poll_server()
+        
         # fast access to models:
         #TODO models should be moved into this class
         self.my_grid = self.game_frame.my_grid._model
@@ -121,7 +162,11 @@ class GameController(object):
         self.their_controller = PlayerController(self.game_frame.their_grid_frame)
         
         # set initial variables
+        self._journal = None
         self.new_game_callback()
+        
+        if GameController.INSTRUMENT_FLAG:
+            self._instrument()
 
         # add events
         self.create_hooks()
@@ -129,6 +174,23 @@ class GameController(object):
         # run the game
         app.mainloop()
         
+    def _instrument(self):
+        '''Record every call of the main phases of a turn in the instrumentation registry.
+        Has to be done before the hooks are created.'''
+        
+        start_tracing()
+        for method_name in ["process_ai_shot", "process_human_shot", "save_callback", "load_callback"]:
+            instrument(self, method_name, "GameController." + method_name)
+        for method_name in ["get_shot", "set_shot_result"]:
+            instrument(self.game_frame.ai, method_name, "ShipAI." + method_name)
+        
+        atexit.register(REGISTRY.dump)
+        
+    def dump_instrumentation_callback(self, event=None):
+        '''Developer tool: print the instrumentation registry.'''
+        
+        REGISTRY.dump()
+        
     def exit_callback(self, event=None):
         '''Quit the game by closing the parent window.'''
         
@@ -152,16 +214,18 @@ class GameController(object):
         if GameController.DEV_FLAG:
             d["X"] = self.exit_callback
             d["Q"] = self.quick_load_callback
+            d["T"] = self.dump_instrumentation_callback
         
         for key_binding, fn in d.items():
             self.game_frame.master.bind(key_binding, fn) # has to be master
             if GameController.DEV_FLAG:
                 print("{} <-- {}".format(key_binding, fn.__name__))
         
-    def save_callback(self, event=None, fname=None):
+    def save_callback(self, event=None, fname=None, callback=None):
         '''Write the game configuration to a JSON file.
         Cannot save the game before both AI and human player have placed ships.
-        fname is the file name'''
+        fname is the file name
+        The file is written in the background. <callback>(error) is called once it is written, with None on success.'''
 
         grids = [self.my_grid, self.enemy_grid]
         
@@ -191,26 +255,157 @@ class GameController(object):
                 obj[player]["shots"] = list(grid.get_shots())
             
             main_obj = {"battleship" : obj} # bind all data to a root element
-            head, tail = os.path.split(fname)
-            if not os.path.isdir(head):
-                os.makedirs(head)
-            with open(fname, "w") as fp:
-                try:
-                    if GameController.DEV_FLAG:
-                        json.dump(main_obj, fp, indent=4, separators=(',', ': '))
-                    else:
-                        json.dump(main_obj, fp, separators=(',', ':'))
-                except TypeError as e:
-                    print(main_obj)
-                    raise e
+            self._save_writer.save(fname, main_obj, callback)
             self._saved = True
         else:
             self.game_frame.show_warning("You cannot save the game before you place your ships and start playing.")
 
-    def autosave_callback(self, event=None):
-        '''Auto-save the state of the game in some file. Do this occasionally.'''
+    def autosave_callback(self, event=None, callback=None):
+        '''Auto-save the state of the game in some file. Do this occasionally.
+        Between autosaves, every event of the game is in its journal.'''
 
-        self.save_callback(event, self._autosave_fname)
+        self.save_callback(event, self._autosave_fname, callback)
+        
+    def _poll_saves(self):
+        '''Report on the saves written in the background since the last call. Runs every SAVE_POLL_DELAY ms.'''
+        
+        for fname, error in self._save_writer.poll():
+            if error is not None:
+                self.game_frame.show_warning("Could not save the game to {}: {}".format(fname, error))
+            elif GameController.DEV_FLAG:
+                print("Saved {}".format(fname))
+                
+        self.game_frame.after(GameController.SAVE_POLL_DELAY, self._poll_saves)
+        
+    def _poll_ai(self):
+        '''Show the shots picked by the AI in the background since the last call. Runs every AI_POLL_DELAY ms.
+        If the AI failed, its turn is ended, and the error raised again.'''
+
+        # schedule the next call first, so polling goes on after an error
+        self.game_frame.after(GameController.AI_POLL_DELAY, self._poll_ai)
+        try:
+            self._ai_worker.poll()
+        except Exception:
+            if self._ai_playing:
+                # give the turn back, rather than leave the opponent's grid disabled for good
+                self._ai_turn += 1
+                if self._ai_after_id is not None:
+                    self.game_frame.after_cancel(self._ai_after_id)
+                    self._ai_after_id = None
+                self._ai_playing = False
+                self.game_frame.their_grid.enable()
+            raise
+        
+    def _poll_server(self):
+        '''Handle the lines sent by the game server since the last call. Runs every SERVER_POLL_DELAY ms.
+        The opponent's shots are shown AI_SHOT_DELAY apart, the lines after them wait for later calls.'''
+        
+        self._server_lines.extend(self._client.poll())
+        while self._server_lines:
+            words = self._server_lines[0]
+            if (words[0] == "SHOT" and words[1] == "1" and
+                    time.time() < self._last_shot_time + GameController.AI_SHOT_DELAY):
+                break
+            self._server_lines.popleft()
+            self._handle_server_line(words)
+            
+        if self._client.connected:
+            self.game_frame.after(GameController.SERVER_POLL_DELAY, self._poll_server)
+        else:
+            self.game_frame.show_warning("Lost the connection to the game server")
+            
+    def _handle_server_line(self, words):
+        '''React to one line from the game server (see game_server.py for the protocol).'''
+        
+        command = words[0]
+        
+        if command == "RULES":
+            fleet = [item.split(":") for item in words[2].split(",")]
+            if Rules(int(words[1]), [(ship, ship, int(length)) for ship, length in fleet]) != self.my_grid.rules:
+                self.game_frame.show_warning("The game server does not play by the same rules")
+        elif command == "GAME":
+            self._server_game = int(words[1])
+        elif command == "ERR":
+            self._awaiting_server = False
+            self.game_frame.show_warning(" ".join(words[1:]))
+        elif self._server_game is None:
+            # left over from the previous game
+            pass
+        elif command == "START":
+            if words[1] == "0":
+                self._ai_playing = False
+                self.game_frame.their_grid.enable()
+        elif command == "SHOT":
+            player, x, y, result = [int(word) for word in words[1:5]]
+            if player == 0:
+                self._server_shot_result(x, y, result, words[5:])
+            else:
+                result = self.process_ai_shot((x, y))
+                if result == Ship.MISS:
+                    self._ai_playing = False
+                    self.game_frame.their_grid.enable()
+        elif command == "OVER":
+            self._winner = GameController.HUMAN_PLAYER if words[1] == "0" else GameController.AI_PLAYER
+            self._ai_playing = False
+            self._awaiting_server = False
+            self.game_over_callback()
+        elif command == "LEFT":
+            self.game_frame.show_warning("Your opponent left the game")
+            
+    def _server_shot_result(self, x, y, result, sunk_words):
+        '''Show the result of the human's shot at (x, y), as decided by the game server.
+        <sunk_words> describe the ship sunk by the shot, if any: short name, x, y and orientation.'''
+        
+        sunk = None
+        if sunk_words:
+            ship, sunk_x, sunk_y, orientation = sunk_words
+            sunk = self.enemy_grid.rules.make_ship(int(sunk_x), int(sunk_y), ship, orientation == "v")
+            
+        self.game_frame.their_grid.record_shot(x, y, result, sunk)
+        self._last_shot_time = time.time()
+        self._awaiting_server = False
+        if sunk is not None:
+            self.game_frame.their_grid_frame.ship_panel.set_sunk(sunk.get_short_name())
+            
+        if result == Ship.MISS:
+            # the server plays the opponent's turn
+            self._ai_playing = True
+            self.game_frame.their_grid.disable()
+            
+    def _start_server_game(self):
+        '''Start the game on the server, against its AI. The opponent's grid is only known through the shots.'''
+        
+        # the ships of the AI on this computer are not the ones played against
+        self.game_frame.their_grid.reset()
+        # until the server starts the game
+        self._ai_playing = True
+        self.game_frame.their_grid.disable()
+        
+        self._client.send("NEW", "AI")
+        for ship_name, (x, y, vertical) in self.my_grid.get_ship_placement().items():
+            self._client.send("PLACE", ship_name, x, y, "v" if vertical else "h")
+        self._client.send("READY")
+        
+    def _start_journal(self):
+        '''Start the journal of this game, with the placement of both players' ships.'''
+        
+        if not self._saved:
+            self._create_game_id()
+            self._saved = True
+        
+        self._journal = GameJournal(self._journal_fname, compact_every=GameController.JOURNAL_COMPACT_EVERY,
+            writer=self._save_writer)
+        self._journal.start(self._game_id)
+        for grid, player in zip([self.my_grid, self.enemy_grid], GameController.PLAYERS):
+            for ship_name, (x, y, vertical) in grid.get_ship_placement().items():
+                self._journal.place(player, ship_name, x, y, vertical)
+                
+    def _close_journal(self):
+        '''Stop journaling this game.'''
+        
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
         
     def quick_load_callback(self, event=None):
         '''Developer tool: quickly load existing game.'''
@@ -223,51 +418,57 @@ class GameController(object):
         
         May raise KeyError if JSON is not in the expected format (see battleship.json for example).
         May raise ValueError if fails to parse file
-        May raise IOError if fails to find file'''
+        May raise IOError if fails to find file
+        
+        The file can also be the journal of an interrupted game, which is then resumed.'''
 
+        if self._client is not None:
+            self.game_frame.show_warning("Saved games cannot be played on a game server")
+            return
+            
         while fname is None or isinstance(fname, list):
             fname = tkFileDialog.askopenfilename(defaultextension="json", 
                     initialdir=os.path.join(os.getcwd(), self.SAVE_DIR),
-                    filetypes=[("Battleship Games", "*.json")])
+                    filetypes=[("Battleship Games", "*.json"), ("Interrupted Games", "*" + JOURNAL_SUFFIX)])
             if isinstance(fname, list):
                     self.game_frame.show_warning("Select one file only")
 
-        fp = open(os.path.join(GameController.SAVE_DIR, fname), "r")
-        obj = json.load(fp)["battleship"] # do this so we don't have to reference ["battleship"] every time
-        fp.close()
+        path = os.path.join(GameController.SAVE_DIR, fname)
+        if path.endswith(JOURNAL_SUFFIX):
+            obj = replay(path)["battleship"]
+        else:
+            fp = open(path, "r")
+            obj = json.load(fp)["battleship"] # do this so we don't have to reference ["battleship"] every time
+            fp.close()
         
         if not warn or tkMessageBox.askyesno(
            "Load Game", 
            "Loading another game will cause you to lose all unsaved progress. Continue?"):
 
-            self.new_game_callback()
-            #TODO just for now, to see if it works
-            #print obj
-            
-        
-            # load the models
-            
-            #TODO models go here
-            grids = [self.game_frame.my_grid._model, self.game_frame.their_grid._model]
-            
-            # placing ships
-            for grid, player in zip(grids, GameController.PLAYERS):
-                for ship_name, coords in obj[player]["ships"].items():
-                    s = Ship(type=str(ship_name),  x=coords[0], y=coords[1], vertical=coords[2])
-                    success = grid.add(s)
-                    #TODO handle the case when this fails (means bad initial config)
-                    assert success
-                
-                grid.finalize(error_check=False)
-                
-            # firing shots
-            for grid, player in zip(grids, GameController.PLAYERS):
-                for shot in obj[player]["shots"]:
-                    grid.process_shot(*shot)
-                    
+            self._begin_game()
+            # reset the view first: the placing state has the AI place a new fleet, which the restore below replaces
+            self.game_frame.reset()
+
+            # build the models and the grids in one pass each, rather than replaying every shot
+            for grid, player in zip([self.game_frame.my_grid, self.game_frame.their_grid], GameController.PLAYERS):
+                grid.restore(obj[player]["ships"], obj[player]["shots"])
             
+            if obj[GameController.PLAYERS[0]]["shots"]:
+                # make the stat model once from the shots so far
+                self.game_frame.ai.restore()
+            else:
+                self.game_frame.ai.reset()
+                self.game_frame.ai.read_stat_model("ai/stat")
+
+            if path.endswith(JOURNAL_SUFFIX):
+                # keep journaling the resumed game where it left off
+                self._game_id = obj["game_id"]
+                self._saved = True
+                self._journal_fname = path
+                self._journal = GameJournal(path, compact_every=GameController.JOURNAL_COMPACT_EVERY,
+                    writer=self._save_writer)
                     
-            self.game_frame.redraw()
+            self.game_frame.redraw(tiles=False)
             return
 
     def warn_hi(self):
@@ -299,6 +500,7 @@ class GameController(object):
             self.game_frame.dev_menu.entryconfig(self.game_frame.menus["dev_auto_place"], command=self.autoplace_ships_callback)
             self.game_frame.dev_menu.entryconfig(self.game_frame.menus["dev_random_shot"], command=self.random_shot_callback)
             self.game_frame.dev_menu.entryconfig(self.game_frame.menus["dev_auto_load"], command=self.quick_load_callback)
+            self.game_frame.dev_menu.entryconfig(self.game_frame.menus["dev_dump_timings"], command=self.dump_instrumentation_callback)
     
     def read_game_state(self, fname):
         '''Read game state from the given file. fname is the file name.'''
@@ -317,8 +519,8 @@ class GameController(object):
             ships = ShipLoader.read("sample_configurations/sample_ship_config.txt")
             
             for ship in ships:
-                self.game_frame.my_grid_frame.ship_panel.ship_buttons[ship._type].invoke()
-                self.game_frame.my_grid.add_ship(*ship.coords(), ship=ship._type, vertical=ship._vertical=="v", callback=self.game_frame.get_add_ship_callback())
+                self.game_frame.my_grid_frame.ship_panel.ship_buttons[ship.get_short_name()].invoke()
+                self.game_frame.my_grid.add_ship(*ship.coords(), ship=ship.get_short_name(), vertical=ship.is_vertical(), callback=self.game_frame.get_add_ship_callback())
             self.game_frame.unselect_ship()
         
         # ships = read_ship_configuration(autoplace_config_file)
@@ -338,7 +540,10 @@ class GameController(object):
             #   update view
             self.game_frame._state = self.game_frame.PLAYING
             self.game_frame.process_state()
-            self.autosave_callback()
+            if self._client is None:
+                self._start_journal()
+            else:
+                self._start_server_game()
             # TODO update model <<< FINALIZE should probably be here
         else:
             self.game_frame.show_warning("Cannot start the game: you have not placed all your ships.")
@@ -374,9 +579,7 @@ class GameController(object):
         Will only execute in play state.'''
         
         if self.game_frame._state == mock1.Game.PLAYING:
-            grid = self.enemy_grid
-            l2 = grid.get_null_squares()
-            shot = random.choice(tuple(l2))
+            shot = self.enemy_grid.random_null_square()
             self.shot_square(shot)
         elif self.game_frame._state == mock1.Game.GAME_OVER:
             self.game_frame.show_warning("Cannot shoot after the game is over")
@@ -385,22 +588,84 @@ class GameController(object):
     
     def shot_square(self, shot):
         '''Call this method when a human has made a shot.
-        The shot is the coordinate in the grid system of the shot.'''
+        The shot is the coordinate in the grid system of the shot.
+        Ignored during the AI's turn, and while waiting for the game server.'''
+        
+        if self._ai_playing or self._awaiting_server:
+            return
+        
+        if self._client is not None:
+            # the server decides the result, see _server_shot_result
+            self._awaiting_server = True
+            self._client.send("SHOT", *shot)
+            return
         
         result = self.process_human_shot(shot)
         
-        if result == Ship.MISS:
-            # disable opponent's grid during their turn
-            result = Ship.NULL
-            self.game_frame.their_grid.disable()
-            while result != Ship.MISS and self._winner is None:
-                result = self.process_ai_shot()
-                
-            # re-enable their grid
-            self.game_frame.their_grid.enable()
+        if self._winner is not None:
+            self.game_over_callback()
+        elif result == Ship.MISS:
+            self._start_ai_turn()
+            
+    def _start_ai_turn(self):
+        '''Start the AI's turn, which goes on until the AI misses.
+        Every step is run from the event loop, so the UI stays responsive.'''
+        
+        self._ai_playing = True
+        # disable opponent's grid during their turn
+        self.game_frame.their_grid.disable()
+        self._pick_ai_shot()
+        
+    def _pick_ai_shot(self):
+        '''Have the AI pick its next shot in the background.'''
+        
+        turn = self._ai_turn
+        self._ai_worker.submit(self.game_frame.ai.get_shot, lambda shot: self._ai_shot_picked(turn, shot))
+        
+    def _ai_shot_picked(self, turn, shot):
+        '''Called from the event loop once the AI has picked <shot>.
+        The shot is shown once AI_SHOT_DELAY has passed since the last shot.'''
+        
+        if turn != self._ai_turn:
+            # the game was left in the meantime
+            return
+        
+        wait = self._last_shot_time + GameController.AI_SHOT_DELAY - time.time()
+        if wait > 0:
+            self._ai_after_id = self.game_frame.after(int(wait * 1000), lambda: self._take_ai_shot(shot))
+        else:
+            self._take_ai_shot(shot)
+            
+    def _take_ai_shot(self, shot):
+        '''Fire the AI's <shot>, then go on with the AI's turn, or end it.'''
+        
+        self._ai_after_id = None
+        result = self.process_ai_shot(shot)
+        
+        # update the AI with the shot's result, in the background, before it picks its next shot
+        ai = self.game_frame.ai
+        self._ai_worker.submit(lambda: ai.set_shot_result(result))
         
         if self._winner is not None:
+            self._ai_playing = False
             self.game_over_callback()
+        elif result == Ship.MISS:
+            self._ai_playing = False
+            # re-enable their grid
+            self.game_frame.their_grid.enable()
+        else:
+            self._pick_ai_shot()
+            
+    def _cancel_ai_turn(self):
+        '''Stop the AI's turn, if any, and wait for the AI to be done with its background work,
+        so it can be reset.'''
+        
+        self._ai_turn += 1
+        if self._ai_after_id is not None:
+            self.game_frame.after_cancel(self._ai_after_id)
+            self._ai_after_id = None
+        self._ai_worker.wait()
+        self._ai_playing = False
 
     def shot_square_callback(self, event=None):
         '''Respond to a shooting event.'''
@@ -421,8 +686,10 @@ class GameController(object):
         
         id = self.game_frame.their_grid.get_tile_id(*shot)
         result = self.game_frame.their_grid.process_shot(id)
+        self._last_shot_time = time.time()
         # disable square regardless of result
-        self.game_frame.their_grid.itemconfig(id, state=DISABLED)
+        self.game_frame.their_grid.disable_tile(id)
+        self._journal_shot("human", shot, result)
         
         if result == Ship.SUNK:
             ship = self.enemy_grid.get_sunk_ship(*shot)
@@ -433,16 +700,13 @@ class GameController(object):
                 
         return result
     
-    def process_ai_shot(self):
-        '''Get the shot from the AI.
-        Process the given shot by the AI.
-        Return the result of the shot'''
+    def process_ai_shot(self, shot):
+        '''Process the given shot by the AI.
+        Return the result of the shot. The AI is not told the result here, see _take_ai_shot.'''
     
-        # start = time.time()
-        shot = self.game_frame.ai.get_shot()
-        tag_id = self.game_frame.my_grid._get_tile_name(*shot)
-        id = self.game_frame.my_grid.find_withtag(tag_id)[0]
+        id = self.game_frame.my_grid.get_tile_id(*shot)
         result = self.game_frame.my_grid.process_shot(id)
+        self._last_shot_time = time.time()
         
         if result == Ship.HIT or result == Ship.SUNK:
             ship = self.my_grid.get_ship_at(*shot)
@@ -455,35 +719,60 @@ class GameController(object):
             if self.my_grid.all_sunk():
                 self._winner = GameController.AI_PLAYER
                 
-        # update the AI with the shot's result
-        self.game_frame.ai.set_shot_result(result)
-        
-        # end = time.time()
-        #TODO need to implement delay here somehow
-        #while end-start < mock1.GameController.AI_SHOT_DELAY:
-        #    end = time.time()
+        self._journal_shot("ai", shot, result)
                 
         return result
     
+    def _journal_shot(self, player, shot, result):
+        '''Record the shot fired by <player> in the journal, if the game has one.'''
+        
+        if self._journal is not None:
+            self._journal.shot(player, shot[0], shot[1], result)
+    
     def game_over_callback(self, event=None):
         '''Call this when the game is over (one of the players has won).
         Initiate appropriate events in model and view.'''
         
-        self.autosave_callback()
+        journal_fname = None
+        if self._journal is not None:
+            self._journal.end("human" if self._winner == GameController.HUMAN_PLAYER else "ai")
+            journal_fname = self._journal.fname
+            self._close_journal()
+            
+        def remove_journal(error):
+            # the finished game is in the autosave, its journal is no longer needed
+            if error is None and journal_fname is not None:
+                os.remove(journal_fname)
+                
+        if self._client is None:
+            self.autosave_callback(callback=remove_journal)
         self.game_frame._state = mock1.Game.GAME_OVER
         self.game_frame.process_state()
         self.game_frame.show_game_over_popup(self._winner)
         
-    def new_game_callback(self, event=None):
-        '''Start a new game.
-        This method can be called at any time.'''
+    def _begin_game(self):
+        '''Start the bookkeeping of a new game: its save files, and who has placed and won.'''
         
+        self._cancel_ai_turn()
+        self._server_game = None
+        self._awaiting_server = False
         self._saved = False
-        self._autosave_fname = os.path.join(GameController.AUTOSAVE_DIR, str(uuid.uuid4()) + ".json")
+        game_uuid = str(uuid.uuid4())
+        self._autosave_fname = os.path.join(GameController.AUTOSAVE_DIR, game_uuid + ".json")
+        self._journal_fname = os.path.join(GameController.AUTOSAVE_DIR, game_uuid + JOURNAL_SUFFIX)
+        self._close_journal()
         
         self.game_frame._winner = None
         self.game_frame._set_ships = {ship : False for ship in Ship.SIZES.keys()}
         
+        self._winner = None
+        
+    def new_game_callback(self, event=None):
+        '''Start a new game.
+        This method can be called at any time.'''
+        
+        self._begin_game()
+        
         # reset the model
         self.game_frame.my_grid.reset()
         self.game_frame.their_grid.reset()
@@ -495,7 +784,17 @@ class GameController(object):
         # reset the view
         self.game_frame.reset()
         
-        self._winner = None
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play battleship.")
+    parser.add_argument("--server", metavar="HOST:PORT",
+            help="play against the AI of a game server (see game_server.py), rather than on this computer")
+    args = parser.parse_args(argv)
+    
+    server = None
+    if args.server:
+        host, port = args.server.rsplit(":", 1)
+        server = (host, int(port))
+    GameController(server)
         
 if __name__ == "__main__":
-    g = GameController()
+    main()
@@ -0,0 +1,330 @@
+'''
+Micro-benchmarks for the model and AI hot paths.
+
+Every benchmark runs on early-game, mid-game and end-game boards, and the results are
+written as JSON. In compare mode, results are checked against a stored baseline and
+any benchmark slower than the baseline by more than the threshold is flagged.
+
+Examples:
+    python benchmark.py -o baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.1
+    python benchmark.py -k can_add
+'''
+
+from __future__ import print_function
+import argparse
+import json
+import platform
+import sys
+import time
+
+from ship_model import Ship
+from grid_model import GridModel
+from bit_grid_model import BitGridModel
+from placement_index import INDEX
+from ship_ai import ShipAI
+from numpy_ship_ai import NumpyShipAI, np
+from fleet_generator import FleetGenerator
+from headless_game import STAT_FILE
+
+# number of shots fired at the board in each game phase
+PHASES = [
+    ("early", 0),
+    ("mid", 25),
+    ("end", 50)
+]
+
+ENGINES = [GridModel, BitGridModel]
+
+AIS = [ShipAI]
+if np is not None:
+    AIS.append(NumpyShipAI)
+
+SEED = 0
+
+# opponent fleets, generated once so every run benchmarks the same boards
+FLEETS = list(FleetGenerator(SEED).batch(16))
+
+
+def make_state(engine, shots, seed=SEED):
+    '''Return (grid, ai) where <grid> is a finalized grid of class <engine> with fleet number <seed>
+    of FLEETS, and <ai> has fired (at most) <shots> shots at it.'''
+
+    grid = engine()
+    for ship, p in zip(INDEX.ships, FLEETS[seed % len(FLEETS)]):
+        grid.add(p.make_ship(ship))
+    grid.finalize()
+
+    ai = ShipAI(enemy_grid_model=grid, seed=seed)
+    ai.read_stat_model(STAT_FILE)
+    for i in range(shots):
+        if grid.all_sunk():
+            break
+        ai.set_shot_result(grid.process_shot(*ai.get_shot()))
+
+    return grid, ai
+
+
+def to_save_json(grids):
+    '''Return the saves/battleship.json document for the given (human, ai) grids,
+    the same as GameController.save_callback.'''
+
+    obj = {"game_id" : 0}
+    for grid, player in zip(grids, ["human", "ai"]):
+        obj[player] = {
+            "ships" : grid.get_ship_placement(),
+            "shots" : list(grid.get_shots())
+        }
+    return json.dumps({"battleship" : obj}, separators=(',', ':'))
+
+
+def from_save_json(s, engine=GridModel):
+    '''Return the (human, ai) grids and the AI from a saves/battleship.json document,
+    the same as GameController.load_callback: each grid is restored in one pass, and the AI
+    makes its stat model once.'''
+
+    obj = json.loads(s)["battleship"]
+    grids = [engine(), engine()]
+
+    for grid, player in zip(grids, ["human", "ai"]):
+        grid.restore(obj[player]["ships"], obj[player]["shots"])
+
+    ai = ShipAI(home_grid_model=grids[1], enemy_grid_model=grids[0])
+    if obj["human"]["shots"]:
+        ai.restore()
+    else:
+        ai.read_stat_model(STAT_FILE)
+
+    return grids, ai
+
+
+class Benchmark(object):
+    '''A single benchmark.
+    <setup>() returns the context for one repetition, and is not timed.
+    <run>(context) is timed, and returns the number of calls it made.'''
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+    def measure(self, repeat, min_time):
+        '''Return the time per call of every repetition, in seconds.
+        Each repetition runs until it has taken at least <min_time> seconds.'''
+
+        times = []
+        for i in range(repeat):
+            calls = 0
+            elapsed = 0.0
+            while elapsed < min_time:
+                context = self.setup()
+                start = time.time()
+                calls += self.run(context)
+                elapsed += time.time() - start
+            times.append(elapsed / calls)
+        return times
+
+
+def _loop(n, fn, *args):
+    '''Return a run function calling <fn> with <args> <n> times.'''
+
+    def run(context):
+        for i in range(n):
+            fn(*args)
+        return n
+    return run
+
+
+def ship_benchmarks():
+    s1 = Ship(2, 3, "a", True)
+    s2 = Ship(0, 5, "b", False)
+    no_setup = lambda: None
+
+    return [
+        Benchmark("ship.get_covering_squares", no_setup, _loop(1000, s1.get_covering_squares)),
+        Benchmark("ship.intersects_with", no_setup, _loop(1000, s1.intersects_with, s2)),
+        Benchmark("fleet.sample", no_setup, _loop(1000, FleetGenerator(SEED).sample))
+    ]
+
+
+def grid_benchmarks(engine, phase, shots):
+    grid, ai = make_state(engine, shots)
+    suffix = "[{},{}]".format(engine.__name__, phase)
+    candidates = [Ship(x, y, ship, v) for ship in Ship.SHORT_NAMES for x in range(0, GridModel.SIZE, 3) for y in range(0, GridModel.SIZE, 3) for v in [True, False]]
+
+    def can_add(context):
+        for s in candidates:
+            grid.can_add(s)
+        return len(candidates)
+
+    squares = [(x, y) for x in range(GridModel.SIZE) for y in range(GridModel.SIZE)]
+
+    def get_state(context):
+        for x, y in squares:
+            grid.get_state(x, y)
+        return len(squares)
+
+    ships = list(grid.get_ships().values())
+    shots_so_far = list(grid.get_shots())
+
+    def process_shot_setup():
+        g = engine()
+        for s in ships:
+            g.add(Ship(s.coords()[0], s.coords()[1], s.get_short_name(), s.is_vertical()))
+        g.finalize()
+        for sq in shots_so_far:
+            g.process_shot(*sq)
+        return g, list(g.get_null_squares())
+
+    def process_shot(context):
+        g, squares = context
+        for sq in squares:
+            g.process_shot(*sq)
+        return len(squares)
+
+    return [
+        Benchmark("grid.can_add" + suffix, lambda: None, can_add),
+        Benchmark("grid.process_shot" + suffix, process_shot_setup, process_shot),
+        Benchmark("grid.get_state" + suffix, lambda: None, get_state),
+        Benchmark("grid.get_null_squares" + suffix, lambda: None, _loop(100, lambda: list(grid.get_null_squares()))),
+        Benchmark("grid.random_null_square" + suffix, lambda: None, _loop(1000, grid.random_null_square))
+    ]
+
+
+def ai_benchmarks(ai_class, phase, shots, engine=GridModel):
+    grid = make_state(engine, shots)[0]
+    if engine is GridModel:
+        suffix = "[{},{}]".format(ai_class.__name__, phase)
+    else:
+        suffix = "[{}+{},{}]".format(ai_class.__name__, engine.__name__, phase)
+
+    ai = ai_class(enemy_grid_model=grid)
+    if shots > 0:
+        # take out the ships sunk so far, as when a saved game is loaded
+        ai.restore()
+    else:
+        ai.read_stat_model(STAT_FILE)
+
+    def place_ships_setup():
+        return ai_class(home_grid_model=GridModel())
+
+    def place_ships(context):
+        context.place_ships()
+        return 1
+
+    return [
+        Benchmark("ai.make_stat_model" + suffix, lambda: None, _loop(5, ai.make_stat_model)),
+        Benchmark("ai.get_shot" + suffix, lambda: None, _loop(100, ai.get_shot)),
+        Benchmark("ai.place_ships[{}]".format(ai_class.__name__), place_ships_setup, place_ships)
+    ]
+
+
+def save_benchmarks(phase, shots):
+    grids = [make_state(GridModel, shots, seed)[0] for seed in [SEED, SEED + 1]]
+    doc = to_save_json(grids)
+
+    return [
+        Benchmark("save.round_trip[{}]".format(phase), lambda: None, _loop(10, lambda: from_save_json(to_save_json(grids)))),
+        Benchmark("save.load[{}]".format(phase), lambda: None, _loop(10, from_save_json, doc))
+    ]
+
+
+def all_benchmarks():
+    benchmarks = ship_benchmarks()
+
+    for phase, shots in PHASES:
+        for engine in ENGINES:
+            benchmarks.extend(grid_benchmarks(engine, phase, shots))
+        for ai_class in AIS:
+            benchmarks.extend(ai_benchmarks(ai_class, phase, shots))
+        # the AI checks its placements against the grid, which BitGridModel does with masks
+        benchmarks.extend(ai_benchmarks(ShipAI, phase, shots, BitGridModel))
+        benchmarks.extend(save_benchmarks(phase, shots))
+
+    # place_ships does not depend on the phase
+    seen = set()
+    unique = []
+    for b in benchmarks:
+        if b.name not in seen:
+            seen.add(b.name)
+            unique.append(b)
+    return unique
+
+
+def run_benchmarks(benchmarks, repeat, min_time, verbose=True):
+    '''Run the benchmarks. Return the results as a JSON-serializable dictionary.'''
+
+    results = {}
+    for b in benchmarks:
+        times = b.measure(repeat, min_time)
+        results[b.name] = {
+            "best" : min(times),
+            "mean" : sum(times) / len(times),
+            "repeat" : repeat
+        }
+        if verbose:
+            print("{:<50} {:>12.3f} us".format(b.name, min(times) * 1e6))
+
+    return {
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "time" : time.time(),
+        "unit" : "seconds per call",
+        "results" : results
+    }
+
+
+def compare(current, baseline, threshold):
+    '''Compare the results to a baseline, using the best time of each benchmark.
+    Return the names of the benchmarks that are slower by more than <threshold> (0.1 is 10%).'''
+
+    regressions = []
+    for name, result in sorted(current["results"].items()):
+        if name not in baseline["results"]:
+            continue
+
+        old = baseline["results"][name]["best"]
+        new = result["best"]
+        change = (new - old) / old
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        print("{:<50} {:>12.3f} us {:>12.3f} us {:>+8.1%} {}".format(name, old * 1e6, new * 1e6, change, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the battleship model and AI.")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown flagged as a regression in compare mode (default 0.1)")
+    parser.add_argument("-k", "--filter", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repetitions of each benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum time of each repetition, in seconds")
+    args = parser.parse_args(argv)
+
+    benchmarks = all_benchmarks()
+    if args.filter:
+        benchmarks = [b for b in benchmarks if args.filter in b.name]
+
+    results = run_benchmarks(benchmarks, args.repeat, args.min_time, verbose=args.compare is None)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=4, separators=(',', ': '), sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("{} regression(s)".format(len(regressions)))
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
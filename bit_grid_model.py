@@ -0,0 +1,203 @@
+'''
+Bitboard implementation of the grid model.
+'''
+
+from ship_model import Ship
+from grid_model import GridModel
+
+
+class BitGridModel(GridModel):
+    '''Model for one grid, with the state kept as integer bitmasks.
+    Has the same public API as GridModel, so it can be used in its place.
+    Best suited to small grids: every operation is linear in the number of squares.
+
+    Below are data representations (one bit per square, see square_bit: bit y * SIZE + x is square (x, y)):
+        * _occupied:
+            all squares on which ships are placed
+        * _ship_masks:
+            maps name of ship to the squares it covers
+        * _sunk:
+            squares of ships which have been sunk (ships keep track of their own hits)
+        * _state:
+            bytearray of the state (NULL, MISS, HIT, SUNK) of every square, by bit
+            single squares are read from here, as testing one bit of a long int is slower than a dict lookup
+        * _shots:
+            squares which have been fired upon, in order
+        * _at:
+            list of the (Ship, mask of the ship) on each square, by bit, None for no ship
+            replaces the _coords lookup of GridModel, which is not used
+    '''
+
+    def reset(self):
+        GridModel.reset(self)
+        self._ship_masks = {}
+        self._occupied = 0
+        self._sunk = 0
+        self._state = bytearray(self.SIZE * self.SIZE)
+        self._shots = []
+        self._at = [None] * (self.SIZE * self.SIZE)
+
+    def get_ship_at(self, x, y):
+        '''Return the ship at the given coordinates, or None.'''
+
+        if 0 <= x < self.SIZE and 0 <= y < self.SIZE:
+            at = self._at[y * self.SIZE + x]
+            if at is not None:
+                return at[0]
+
+    def get_sunk_ship(self, x, y):
+        '''Return sunk ship at (x, y).
+        If ship is not sunk, return None.'''
+
+        if self.get_state(x, y) == Ship.SUNK:
+            return self.get_ship_at(x, y)
+
+    def process_shot(self, x, y):
+        '''Process shooting the given square.
+        Return result.'''
+
+        if not self._finalized:
+            self.finalize()
+
+        i = y * self.SIZE + x
+        state = self._state
+        if not state[i]:
+            sq = (x, y)
+            self._shots.append(sq)
+            self._mark_shot(sq)
+
+        at = self._at[i]
+        if at is None:
+            state[i] = Ship.MISS
+            return Ship.MISS
+
+        s = at[0]
+        s.mark(x, y)
+        if s.is_sunk():
+            self._set_sunk(s, at[1])
+            return Ship.SUNK
+        else:
+            state[i] = Ship.HIT
+            return Ship.HIT
+
+    def _set_sunk(self, s, mask):
+        '''Mark the squares <mask> of ship <s> as sunk.'''
+
+        self._sunk |= mask
+        for x, y in s.get_covering_squares():
+            self._state[y * self.SIZE + x] = Ship.SUNK
+
+    def record_shot(self, x, y, result, sunk_ship=None):
+        i = y * self.SIZE + x
+        if not self._state[i]:
+            self._shots.append((x, y))
+            self._mark_shot((x, y))
+
+        if sunk_ship is not None:
+            p = self._get_placement(sunk_ship)
+            self._place(sunk_ship, p)
+            for sq in sunk_ship.get_covering_squares():
+                sunk_ship.mark(*sq)
+            self._set_sunk(sunk_ship, p.mask)
+        else:
+            self._state[i] = result
+
+    def _restore_shots(self, shots):
+        state = self._state
+        for x, y in shots:
+            i = y * self.SIZE + x
+            if not state[i]:
+                self._shots.append((x, y))
+
+            at = self._at[i]
+            if at is not None:
+                at[0].mark(x, y)
+                state[i] = Ship.HIT
+            else:
+                state[i] = Ship.MISS
+
+        for name, s in self._ships.items():
+            if s.is_sunk():
+                self._set_sunk(s, self._ship_masks[name])
+
+    def all_sunk(self):
+        '''Return True iff all the ships on this grid have been sunk.'''
+
+        return self._sunk == self._occupied
+
+    def get_state(self, x, y):
+        '''Return state of given square, which must be on the grid.'''
+
+        return self._state[y * self.SIZE + x]
+
+    def is_empty_square(self, sq):
+        '''Return True iff the square (x, y) has not been fired upon.'''
+
+        return not self._state[sq[1] * self.SIZE + sq[0]]
+
+    def _can_add_mask(self, name, mask):
+        '''Whether the ship called <name> can be placed on the squares in <mask>.
+        Once ship placement is finalized, only sunk ships are considered.'''
+
+        if self._finalized:
+            conflict = mask & self._sunk
+            if not conflict:
+                return True
+            own = self._ship_masks.get(name, 0) & self._sunk
+        else:
+            conflict = mask & self._occupied
+            if not conflict:
+                return True
+            own = self._ship_masks.get(name, 0)
+
+        # can overlap with itself
+        return not conflict & ~own
+
+    def can_add_placement(self, p, ship=None):
+        '''Whether the given placement (from the placement index) of the ship <ship> can be added to the grid.
+        <ship> may be None for a ship which is not on the grid.'''
+
+        return self._can_add_mask(ship, p.mask)
+
+    def can_add(self, s):
+        '''Wether the given ship *object* can be added to the grid.'''
+
+        p = s.get_placement()
+        if p.index is not self._index:
+            # a ship made for other rules
+            p = self._index.get_ship_placement(s)
+            if p is None:
+                return False
+        elif p.id is None:
+            return False
+        return self._can_add_mask(s.get_short_name(), p.mask)
+
+    def _place(self, s, p):
+        name = s.get_short_name()
+        self._unplace(name)
+        self._ships[name] = s
+        self._ship_masks[name] = p.mask
+        self._occupied |= p.mask
+        at = (s, p.mask)
+        for x, y in p.squares:
+            self._at[y * self.SIZE + x] = at
+
+    def _unplace(self, name):
+        s = self._ships.pop(name, None)
+        if s is not None:
+            self._occupied &= ~self._ship_masks.pop(name)
+            for x, y in s.get_covering_squares():
+                i = y * self.SIZE + x
+                # squares of unsunk ships may be shared once finalized
+                if self._at[i] is not None and self._at[i][0] is s:
+                    self._at[i] = None
+
+    def get_missed_shots(self):
+        '''Return a list of shots on this grid, but only those that missed.'''
+
+        return [sq for sq in self._shots if self._state[sq[1] * self.SIZE + sq[0]] == Ship.MISS]
+
+    def get_shots(self):
+        '''Return list of shots made on this grid.'''
+
+        return list(self._shots)
@@ -0,0 +1,99 @@
+'''
+Mapping of square to stat model value which keeps track of its maximum.
+'''
+
+import heapq
+
+
+class DensityMap(object):
+    '''Mapping of square to value, used like a dict by ShipAI for its stat model.
+    Keeps the positive values in buckets, so the squares with the largest value can be found
+    without scanning every square.
+
+    Below are data representations:
+        * _values:
+            maps square to value
+        * _buckets:
+            maps every positive value to the set of squares with that value
+        * _heap:
+            max-heap (as negated values) of the values in _buckets
+            may also hold values whose bucket is gone, these are dropped lazily
+    '''
+
+    def __init__(self, values=None):
+        '''Create a new map.
+        <values>, if given, is the mutable mapping to keep the values in, such as a copy-on-write
+        view of a stat model. It is used as is, not copied.'''
+
+        if values is None:
+            values = {}
+        self._values = values
+        self._buckets = {}
+
+        for sq, value in values.items():
+            if value > 0:
+                self._buckets.setdefault(value, set()).add(sq)
+        self._heap = [-value for value in self._buckets]
+        heapq.heapify(self._heap)
+
+    def __getitem__(self, sq):
+        return self._values[sq]
+
+    def __setitem__(self, sq, value):
+        old = self._values.get(sq)
+        if old == value:
+            return
+        self._values[sq] = value
+
+        if old is not None and old > 0:
+            bucket = self._buckets[old]
+            bucket.discard(sq)
+            if not bucket:
+                del self._buckets[old]
+
+        if value > 0:
+            bucket = self._buckets.get(value)
+            if bucket is None:
+                bucket = self._buckets[value] = set()
+                heapq.heappush(self._heap, -value)
+            bucket.add(sq)
+
+    def __contains__(self, sq):
+        return sq in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def keys(self):
+        return self._values.keys()
+
+    def values(self):
+        return self._values.values()
+
+    def items(self):
+        return self._values.items()
+
+    def get_max(self):
+        '''Return (value, squares): the largest positive value, and the set of squares with it.
+        Return (0, empty set) if no value is positive. The set must not be modified.'''
+
+        # drop stale values, and rebuild the heap if too many of them pile up
+        if len(self._heap) > 4 * len(self._buckets) + 16:
+            self._heap = [-value for value in self._buckets]
+            heapq.heapify(self._heap)
+        while self._heap and -self._heap[0] not in self._buckets:
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return (0, set())
+        value = -self._heap[0]
+        return (value, self._buckets[value])
@@ -0,0 +1,55 @@
+'''
+Fast random fleet generator, using the placement index.
+'''
+
+import random
+
+from placement_index import INDEX
+
+
+class FleetGenerator(object):
+    '''Generates fleets uniformly at random over all legal layouts.
+
+    Each attempt picks a placement for every ship independently and uniformly, and the
+    attempt is thrown away as soon as two ships overlap. The fleets which survive are
+    therefore uniform over all the layouts where no ships overlap.'''
+
+    def __init__(self, seed=None, index=INDEX, rng=None):
+        '''Create a generator seeded with <seed>.
+        Alternatively, <rng> is the random.Random instance (or module) to use.'''
+
+        if rng is None:
+            rng = random.Random(seed)
+        self._random = rng.random
+
+        # short names of the ships, in the order of the placements of a fleet
+        self.ships = list(index.ships.keys())
+
+        # try the largest ships first, so overlapping attempts are rejected early
+        order = sorted(range(len(self.ships)), key=lambda i: -index.ships[self.ships[i]])
+        self._placements = [index.by_ship[self.ships[i]] for i in order]
+        # where each ship of the index ends up in an attempt
+        self._positions = [order.index(i) for i in range(len(self.ships))]
+
+    def sample(self):
+        '''Return a random fleet, as a list of placements in the order of self.ships.'''
+
+        rand = self._random
+
+        while True:
+            fleet = []
+            mask = 0
+            for placements in self._placements:
+                p = placements[int(rand() * len(placements))]
+                if p.mask & mask:
+                    break
+                mask |= p.mask
+                fleet.append(p)
+            else:
+                return [fleet[i] for i in self._positions]
+
+    def batch(self, n):
+        '''Yield <n> random fleets.'''
+
+        for i in range(n):
+            yield self.sample()
@@ -0,0 +1,71 @@
+'''
+Connection to a game server (see game_server.py), for a UI.
+Does not import Tk: lines from the server are read on a background thread, and collected by the
+UI thread with poll(), such as from an after() loop.
+'''
+
+import socket
+import threading
+
+from six.moves import queue
+
+
+class GameClient(object):
+    '''Client of a game server. Commands are sent as they are given, replies are read in the background.
+
+    Below are data representations:
+        * _lines:
+            queue of the lines received from the server (as lists of words), for poll()
+            None once the server has closed the connection
+    '''
+
+    def __init__(self, host, port, timeout=10):
+        '''Connect to the server at <host>:<port>. May raise socket.error if the server cannot be reached.'''
+
+        self._sock = socket.create_connection((host, port), timeout)
+        self._sock.settimeout(None)
+        self._lines = queue.Queue()
+        self.connected = True
+
+        self._thread = threading.Thread(target=self._run, name="GameClient")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        fp = self._sock.makefile("rb")
+        try:
+            for line in fp:
+                self._lines.put(line.decode("ascii", "replace").split())
+        except (IOError, OSError):
+            pass
+        finally:
+            fp.close()
+            self._lines.put(None)
+
+    def send(self, *words):
+        '''Send one command, made of the given words.'''
+
+        line = " ".join(str(word) for word in words) + "\n"
+        self._sock.sendall(line.encode("ascii"))
+
+    def poll(self):
+        '''Return the list of lines (as lists of words) received since the last call.
+        Call this from the UI thread. Sets connected to False once the server has closed the connection.'''
+
+        lines = []
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except queue.Empty:
+                return lines
+            if line is None:
+                self.connected = False
+            elif line:
+                lines.append(line)
+
+    def close(self):
+        try:
+            self.send("QUIT")
+        except (IOError, OSError):
+            pass
+        self._sock.close()
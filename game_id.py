@@ -0,0 +1,107 @@
+'''
+Allocates unique game IDs, safely across threads and processes sharing one ID file.
+
+The ID file holds the highest ID handed out so far, or reserved by a running process.
+A process claims a block of IDs at once, under a file lock, and hands them out from memory.
+The file is updated before any ID of the block is used, so a crash only leaves a gap:
+an ID is never returned twice.
+'''
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from save_writer import write_atomic
+
+LOCK_SUFFIX = ".lock"
+
+
+class FileLock(object):
+    '''Exclusive lock shared by all processes, held on a lock file of its own
+    (the ID file itself is replaced on every write, so it cannot hold the lock).
+    Use as a context manager.'''
+
+    def __init__(self, fname):
+        self.fname = fname
+        self._fp = None
+
+    def __enter__(self):
+        self._fp = open(self.fname, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._fp.fileno(), fcntl.LOCK_EX)
+        else:
+            self._fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except (IOError, OSError):
+                    # LK_LOCK gives up after 10 seconds, keep waiting
+                    pass
+        return self
+
+    def __exit__(self, *args):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fp.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fp.seek(0)
+                msvcrt.locking(self._fp.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fp.close()
+            self._fp = None
+
+
+class GameIdAllocator(object):
+    '''Hands out game IDs, reserving them from the ID file a block at a time.
+
+    Below are data representations:
+        * _next:
+            next ID to hand out
+        * _end:
+            end of the reserved block (exclusive), the block is used up when _next == _end
+    '''
+
+    BLOCK_SIZE = 16
+
+    def __init__(self, fname, block_size=BLOCK_SIZE):
+        '''Allocate IDs from the file <fname>, reserving <block_size> IDs at a time.'''
+
+        self.fname = fname
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(fname + LOCK_SUFFIX)
+        self._next = 0
+        self._end = 0
+
+    def _read_last_id(self):
+        '''Return the highest ID reserved so far, 0 if none.'''
+
+        if not os.path.exists(self.fname):
+            return 0
+        with open(self.fname) as fp:
+            # leading 0 makes the ID 0 when the file is empty
+            return int("0" + fp.read().strip())
+
+    def _reserve(self):
+        with self._file_lock:
+            last = self._read_last_id()
+            write_atomic(self.fname, str(last + self._block_size))
+        self._next = last + 1
+        self._end = last + self._block_size + 1
+
+    def next_id(self):
+        '''Return a new game ID, never returned before by any process using the same file.'''
+
+        with self._lock:
+            if self._next == self._end:
+                self._reserve()
+            game_id = self._next
+            self._next += 1
+            return game_id
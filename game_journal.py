@@ -0,0 +1,223 @@
+'''
+Append-only journal of the events of a game.
+
+Every event is one compact JSON line, flushed as soon as it is written, so a crash loses at most
+the event being written, and each write costs the same whatever the size of the game.
+The journal can be replayed into the battleship.json document used by saved games, and
+compacted into a single snapshot line holding that document.
+
+Records ("e" is the type of event):
+    {"e": "start", "game_id": 12}
+    {"e": "place", "player": "human", "ship": "a", "x": 0, "y": 0, "v": true}
+    {"e": "shot", "player": "ai", "x": 3, "y": 4, "r": 2}
+        a shot fired *by* <player>, with its result
+    {"e": "end", "winner": "human"}
+    {"e": "snapshot", "battleship": {...}}
+        the whole game so far, as in battleship.json
+'''
+
+import copy
+import json
+import os
+
+from save_writer import write_atomic, replace_file
+
+PLAYERS = ["human", "ai"]
+SUFFIX = ".journal"
+# snapshot being written in the background, next to the journal
+COMPACT_SUFFIX = ".compact"
+
+
+def empty_game(game_id=None):
+    '''Return the battleship.json document (without the root element) of a game with no ships.'''
+
+    obj = {"game_id" : game_id}
+    for player in PLAYERS:
+        obj[player] = {"ships" : {}, "shots" : []}
+    return obj
+
+
+def apply_record(obj, record):
+    '''Apply the journal record to the document <obj> (without the root element). Return the document.'''
+
+    e = record["e"]
+
+    if e == "snapshot":
+        return copy.deepcopy(record["battleship"])
+    elif e == "start":
+        obj["game_id"] = record["game_id"]
+    elif e == "place":
+        obj[record["player"]]["ships"][record["ship"]] = [record["x"], record["y"], record["v"]]
+    elif e == "shot":
+        # shots are listed under the grid that was shot at
+        target = PLAYERS[1 - PLAYERS.index(record["player"])]
+        obj[target]["shots"].append([record["x"], record["y"]])
+
+    return obj
+
+
+def read_records(fname):
+    '''Yield the records in the journal file.
+    A last line cut short by a crash is ignored, any other bad line raises ValueError.'''
+
+    with open(fname) as fp:
+        lines = fp.read().split("\n")
+
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            if i < len(lines) - 1 and any(l.strip() for l in lines[i + 1:]):
+                raise
+
+
+def replay(fname):
+    '''Return the battleship.json document of the game in the journal file.'''
+
+    obj = empty_game()
+    for record in read_records(fname):
+        obj = apply_record(obj, record)
+    return {"battleship" : obj}
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(',', ':'))
+
+
+def _truncate_torn_record(fname):
+    '''Cut a last line left without its newline by a crash, so new records start on a line of their own.'''
+
+    with open(fname, "rb+") as fp:
+        data = fp.read()
+        if data and not data.endswith(b"\n"):
+            fp.truncate(data.rfind(b"\n") + 1)
+
+
+class GameJournal(object):
+    '''Journal of one game, open for appending.
+    Appending to an existing journal continues the game recorded in it.
+
+    With a SaveWriter, compaction does not block: the snapshot is written to a file next to the
+    journal in the background, and the records appended meanwhile are added to it once the writer
+    reports it written (from SaveWriter.poll()). Only then does it replace the journal.
+
+    Below are data representations:
+        * _obj:
+            the battleship.json document of the game so far, kept up to date with every record
+        * _events:
+            number of records since the last snapshot
+        * _compacting:
+            list of the records appended since the snapshot being written in the background,
+            None if there is none
+    '''
+
+    def __init__(self, fname, compact_every=None, sync=False, writer=None):
+        '''Open the journal file <fname>.
+        <compact_every>, if given, is the number of records after which the journal is compacted.
+        <sync> determines whether every record is also forced to disk, rather than only flushed.
+        <writer>, if given, is the SaveWriter which writes the snapshots of the journal.'''
+
+        self.fname = fname
+        self._compact_every = compact_every
+        self._sync = sync
+        self._writer = writer
+        self._compacting = None
+
+        head, tail = os.path.split(fname)
+        if head and not os.path.isdir(head):
+            os.makedirs(head)
+
+        # left by a crash during compaction: the journal itself is complete
+        if os.path.exists(fname + COMPACT_SUFFIX):
+            os.remove(fname + COMPACT_SUFFIX)
+
+        if os.path.exists(fname):
+            self._obj = replay(fname)["battleship"]
+            _truncate_torn_record(fname)
+        else:
+            self._obj = empty_game()
+        self._events = 0
+        self._fp = open(fname, "a")
+
+    def _append(self, record):
+        self._obj = apply_record(self._obj, record)
+        self._fp.write(_dumps(record) + "\n")
+        self._fp.flush()
+        if self._sync:
+            os.fsync(self._fp.fileno())
+
+        if self._compacting is not None:
+            self._compacting.append(record)
+        self._events += 1
+        if self._compact_every is not None and self._events >= self._compact_every and self._compacting is None:
+            self.compact()
+
+    def start(self, game_id):
+        self._append({"e" : "start", "game_id" : game_id})
+
+    def place(self, player, ship, x, y, vertical):
+        self._append({"e" : "place", "player" : player, "ship" : ship, "x" : x, "y" : y, "v" : bool(vertical)})
+
+    def shot(self, player, x, y, result):
+        '''Record a shot fired by <player>.'''
+
+        self._append({"e" : "shot", "player" : player, "x" : x, "y" : y, "r" : result})
+
+    def end(self, winner):
+        self._append({"e" : "end", "winner" : winner})
+
+    def get_document(self):
+        '''Return the battleship.json document of the game so far.'''
+
+        return {"battleship" : copy.deepcopy(self._obj)}
+
+    def compact(self):
+        '''Replace the journal with a single snapshot of the game so far.
+        With a writer, the snapshot is only queued, and does nothing if one is already being written.'''
+
+        if self._compacting is not None:
+            return
+
+        record = {"e" : "snapshot", "battleship" : copy.deepcopy(self._obj)}
+        self._events = 0
+
+        if self._writer is None:
+            self._fp.close()
+            write_atomic(self.fname, _dumps(record) + "\n")
+            self._fp = open(self.fname, "a")
+        else:
+            self._compacting = []
+            self._writer.save(self.fname + COMPACT_SUFFIX, record, self._finish_compact, compact=True)
+
+    def _finish_compact(self, error):
+        '''Called by SaveWriter.poll() once the snapshot is written:
+        add the records appended since to it, and have it replace the journal.'''
+
+        records = self._compacting
+        self._compacting = None
+        compact_fname = self.fname + COMPACT_SUFFIX
+
+        if error is not None or self._fp is None or not os.path.exists(compact_fname):
+            # failed, or closed since: keep the journal as it is
+            if os.path.exists(compact_fname):
+                os.remove(compact_fname)
+            return
+
+        with open(compact_fname, "a") as fp:
+            # the writer does not end the snapshot with a newline
+            fp.write("\n")
+            for record in records:
+                fp.write(_dumps(record) + "\n")
+            fp.flush()
+            if self._sync:
+                os.fsync(fp.fileno())
+
+        self._fp.close()
+        replace_file(compact_fname, self.fname)
+        self._fp = open(self.fname, "a")
+
+    def close(self):
+        self._fp.close()
+        self._fp = None
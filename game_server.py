@@ -0,0 +1,296 @@
+'''
+Server hosting many games of battleship at once over TCP, human vs human or human vs AI.
+Built on asyncio, so Python 3 only. Does not import Tk.
+
+Examples:
+    python game_server.py --port 8765
+    python game_server.py --port 8765 --reuse-port   (once per core)
+
+With --reuse-port, several servers share one port and the system spreads the connections
+between them. A game can only be joined on the server it was created on, so use separate
+ports for human vs human games.
+
+Protocol: one command per line, words separated by spaces. Squares are 0-based (x, y),
+orientations are "v" (vertical) or "h" (horizontal), shot results are those of Ship (1 miss, 2 hit, 3 sunk).
+
+    Client:
+        NEW AI                      start a game against the server's AI
+        NEW HUMAN                   start a game and wait for someone to join it
+        JOIN <id>                   join the game <id> as player 1
+        PLACE <ship> <x> <y> <v|h>  place one of your ships, or move it
+        READY                       done placing ships
+        SHOT <x> <y>                fire at the opponent's grid, on your turn
+        QUIT
+    Server:
+        RULES <size> <ship>:<length>,...    sent on connection
+        GAME <id> <player>          you are <player> (0 or 1) in the game <id>
+        OK
+        ERR <message>
+        JOINED                      the opponent joined
+        START <player>              both players are ready, <player> shoots first
+        SHOT <player> <x> <y> <result> [<ship> <x> <y> <v|h>]
+                                    a shot fired by <player>, with the ship it sunk, if any
+        OVER <player>               <player> won
+        LEFT                        the opponent left the game
+
+A line longer than MAX_LINE bytes gets an ERR line, and the connection is closed.
+'''
+
+from __future__ import print_function
+import argparse
+import asyncio
+import os
+
+from game_id import GameIdAllocator
+from game_session import GameSession, SessionError
+from headless_game import AI_CLASSES, STAT_FILE
+from rules import CLASSIC, Rules
+from ship_ai import ShipAI
+
+DEFAULT_PORT = 8765
+# connections waiting to be accepted, asyncio's default of 100 is too few when many clients connect at once
+BACKLOG = 4096
+# longest line read from a client, in bytes
+MAX_LINE = 2 ** 16
+ID_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "config", "game_id.txt")
+
+
+def format_outcome(outcome):
+    '''Return the SHOT line of the given ShotOutcome.'''
+
+    words = ["SHOT", outcome.player, outcome.x, outcome.y, outcome.result]
+    if outcome.sunk is not None:
+        x, y = outcome.sunk.coords()
+        words += [outcome.sunk.get_short_name(), x, y, "v" if outcome.sunk.is_vertical() else "h"]
+    return " ".join(str(word) for word in words)
+
+
+def format_rules(rules):
+    '''Return the RULES line of the given rules.'''
+
+    fleet = ",".join("{}:{}".format(ship, length) for ship, length in rules.fleet.items())
+    return "RULES {} {}".format(rules.size, fleet)
+
+
+def parse_vertical(word):
+    if word not in ("v", "h"):
+        raise SessionError("Orientation must be v or h")
+    return word == "v"
+
+
+class Match(object):
+    '''A game hosted by the server, with the connections of its players.
+
+    Below are data representations:
+        * writers:
+            StreamWriter of each player, None for a player who is not connected (or an AI)
+        * lock:
+            held while a shot, and the AI's turn after it, are played
+    '''
+
+    def __init__(self, game_id, session):
+        self.game_id = game_id
+        self.session = session
+        self.writers = [None, None]
+        self.lock = asyncio.Lock()
+
+    def send(self, player, line):
+        writer = self.writers[player]
+        if writer is not None:
+            writer.write((line + "\n").encode("ascii"))
+
+    def broadcast(self, line):
+        for player in range(2):
+            self.send(player, line)
+
+
+class Connection(object):
+    '''A client of the server, and the game they are playing, if any.'''
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.player = None
+
+    def send(self, line):
+        self.writer.write((line + "\n").encode("ascii"))
+
+
+class GameServer(object):
+    '''Hosts any number of games, each played by its own clients.
+
+    Below are data representations:
+        * _matches:
+            maps game ID to the Match of every game with a player connected
+    '''
+
+    def __init__(self, rules=CLASSIC, ai_class=ShipAI, stat_file=None, game_ids=None):
+        '''Create a server for games with the given rules.
+        The AI of human vs AI games is of class <ai_class>, and starts from the stat model in <stat_file>,
+        by default ai/stat for the classic rules.
+        <game_ids> is the GameIdAllocator of game IDs, by default shared with the other games in config/.'''
+
+        if stat_file is None and rules == CLASSIC:
+            stat_file = STAT_FILE
+        if game_ids is None:
+            game_ids = GameIdAllocator(ID_FILE)
+
+        self.rules = rules
+        self._ai_class = ai_class
+        self._stat_file = stat_file
+        self._game_ids = game_ids
+        self._matches = {}
+
+    async def start(self, host="localhost", port=DEFAULT_PORT, reuse_port=False):
+        '''Start listening. Return the asyncio server.'''
+
+        kwargs = {"reuse_port" : True} if reuse_port else {}
+        return await asyncio.start_server(self.handle_client, host, port, backlog=BACKLOG, limit=MAX_LINE, **kwargs)
+
+    async def handle_client(self, reader, writer):
+        '''Serve one client until they quit or disconnect.'''
+
+        conn = Connection(writer)
+        conn.send(format_rules(self.rules))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # the rest of the line cannot be told apart from the next command
+                    conn.send("ERR Line too long")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                words = line.decode("ascii", "replace").split()
+                if not words:
+                    continue
+                if words[0].upper() == "QUIT":
+                    break
+
+                try:
+                    await self._dispatch(conn, words)
+                except SessionError as e:
+                    conn.send("ERR {}".format(e))
+                except (ValueError, IndexError):
+                    conn.send("ERR Bad command: {}".format(" ".join(words)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(conn)
+            writer.close()
+
+    async def _dispatch(self, conn, words):
+        command = words[0].upper()
+
+        if command == "NEW":
+            self._new(conn, words[1].upper() == "AI")
+        elif command == "JOIN":
+            self._join(conn, int(words[1]))
+        elif conn.match is None:
+            raise SessionError("Not in a game")
+        elif command == "PLACE":
+            conn.match.session.place(conn.player, words[1], int(words[2]), int(words[3]), parse_vertical(words[4]))
+            conn.send("OK")
+        elif command == "READY":
+            match = conn.match
+            started = match.session.set_ready(conn.player)
+            conn.send("OK")
+            if started:
+                match.broadcast("START {}".format(match.session.turn))
+                async with match.lock:
+                    await self._play_ai(match)
+        elif command == "SHOT":
+            match = conn.match
+            async with match.lock:
+                outcome = match.session.shoot(conn.player, int(words[1]), int(words[2]))
+                self._announce(match, outcome)
+                await self._play_ai(match)
+        else:
+            raise SessionError("Unknown command {}".format(words[0]))
+
+    def _new(self, conn, against_ai):
+        self._leave(conn)
+        game_id = self._game_ids.next_id()
+        ai_class = self._ai_class if against_ai else None
+        match = Match(game_id, GameSession(self.rules, ai_class, self._stat_file))
+        self._matches[game_id] = match
+        self._seat(conn, match, 0)
+
+    def _join(self, conn, game_id):
+        match = self._matches.get(game_id)
+        if match is None or match.session.ais or match.writers[1] is not None or match.session.ready[1]:
+            raise SessionError("Game {} cannot be joined".format(game_id))
+        self._leave(conn)
+        self._seat(conn, match, 1)
+        match.send(0, "JOINED")
+
+    def _seat(self, conn, match, player):
+        match.writers[player] = conn.writer
+        conn.match = match
+        conn.player = player
+        conn.send("GAME {} {}".format(match.game_id, player))
+
+    def _leave(self, conn):
+        '''Take the client out of their game, if any. The game is dropped once no one is left in it.'''
+
+        match = conn.match
+        if match is None:
+            return
+
+        match.writers[conn.player] = None
+        match.send(1 - conn.player, "LEFT")
+        if match.writers == [None, None]:
+            del self._matches[match.game_id]
+        conn.match = None
+        conn.player = None
+
+    def _announce(self, match, outcome):
+        match.broadcast(format_outcome(outcome))
+        if match.session.winner is not None:
+            match.broadcast("OVER {}".format(match.session.winner))
+
+    async def _play_ai(self, match):
+        '''Play the AI's turn, if it is the AI's turn. Each shot is picked on a worker thread,
+        so other games go on meanwhile.'''
+
+        loop = asyncio.get_running_loop()
+        while match.session.get_ai_to_play() is not None:
+            outcome = await loop.run_in_executor(None, match.session.play_ai_shot)
+            self._announce(match, outcome)
+
+    def get_match_count(self):
+        return len(self._matches)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host games of battleship over TCP.")
+    parser.add_argument("--host", default="localhost", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--reuse-port", action="store_true", help="share the port with other servers, one per core")
+    parser.add_argument("--ai", choices=sorted(AI_CLASSES.keys()), default="density", help="AI strategy")
+    parser.add_argument("--size", type=int, default=CLASSIC.size, help="side of the board (default: %(default)s)")
+    parser.add_argument("--ships", help="comma-separated lengths of the ships (default: classic fleet)")
+    args = parser.parse_args(argv)
+
+    if args.ships:
+        rules = Rules.generate(args.size, [int(length) for length in args.ships.split(",")])
+    else:
+        rules = Rules(args.size)
+
+    async def serve():
+        server = await GameServer(rules, AI_CLASSES[args.ai]).start(args.host, args.port, args.reuse_port)
+        print("Serving {} on {}".format(rules, ", ".join(str(s.getsockname()) for s in server.sockets)))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
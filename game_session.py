@@ -0,0 +1,144 @@
+'''
+A game of battleship between two players, with no UI and no I/O.
+Does not import Tk: the same session can be played from the Tk UI, a server or a script.
+'''
+
+from collections import namedtuple
+
+from ship_model import Ship
+from grid_model import GridModel
+from rules import CLASSIC
+
+
+class ShotOutcome(namedtuple("ShotOutcome", ["player", "x", "y", "result", "sunk"])):
+    '''A shot fired by <player> at (x, y), with its result.
+    <sunk> is the Ship sunk by the shot, None if no ship was sunk.'''
+
+    __slots__ = ()
+
+
+class SessionError(ValueError):
+    '''A move which is not allowed at this point of the game.'''
+
+
+class GameSession(object):
+    '''A game between players 0 and 1. Either player may be played by an AI.
+    Both players place their ships, then player 0 shoots first, and a player keeps
+    shooting until they miss.
+
+    Below are data representations:
+        * grids:
+            grid of each player, shot at by the other player
+        * ais:
+            maps player to the AI playing them, for the players played by an AI
+        * ready:
+            whether each player is done placing their ships
+        * turn:
+            player whose turn it is to shoot, None until both players are ready
+        * winner:
+            player who won, None until the game is over
+    '''
+
+    PLACING = 0
+    PLAYING = 1
+    GAME_OVER = 2
+
+    def __init__(self, rules=CLASSIC, ai_class=None, stat_file=None):
+        '''Set up a new game with the given rules.
+        <ai_class>, if given, is the class of the AI playing player 1, which places its ships right away.
+        The AI starts from the stat model in <stat_file>, if given.'''
+
+        self.rules = rules
+        self.grids = [GridModel(rules), GridModel(rules)]
+        self.ais = {}
+        self.ready = [False, False]
+        self.turn = None
+        self.winner = None
+
+        if ai_class is not None:
+            ai = ai_class(self.grids[1], self.grids[0])
+            if stat_file is not None:
+                ai.read_stat_model(stat_file)
+            ai.place_ships()
+            self.ais[1] = ai
+            self.set_ready(1)
+
+    def get_phase(self):
+        '''Return PLACING, PLAYING or GAME_OVER.'''
+
+        if self.winner is not None:
+            return GameSession.GAME_OVER
+        elif self.turn is not None:
+            return GameSession.PLAYING
+        else:
+            return GameSession.PLACING
+
+    def place(self, player, ship, x, y, vertical):
+        '''Place the ship called <ship> of <player> at (x, y), or move it there.
+        Raise SessionError if the ship cannot be placed there.'''
+
+        if self.ready[player]:
+            raise SessionError("Ships cannot be moved once placed")
+        if ship not in self.rules.fleet:
+            raise SessionError("No ship called {}".format(ship))
+        if not self.grids[player].add_ship(x, y, ship, vertical):
+            raise SessionError("Ship {} does not fit at {}".format(ship, (x, y)))
+
+    def set_ready(self, player):
+        '''Declare <player> done placing their ships. Return True iff this starts the game.
+        Raise SessionError if some ships have not been placed.'''
+
+        if not self.grids[player].has_all_ships():
+            raise SessionError("Not all ships have been placed")
+
+        self.ready[player] = True
+        if all(self.ready) and self.turn is None:
+            for grid in self.grids:
+                grid.finalize()
+            self.turn = 0
+            return True
+        return False
+
+    def shoot(self, player, x, y):
+        '''Fire the shot of <player> at (x, y) on the other player's grid. Return its ShotOutcome.
+        Raise SessionError if it is not the player's turn, or the square cannot be shot.'''
+
+        if self.get_phase() != GameSession.PLAYING:
+            raise SessionError("The game is not being played")
+        if player != self.turn:
+            raise SessionError("Not your turn")
+
+        grid = self.grids[1 - player]
+        if not grid.is_valid_square(x, y):
+            raise SessionError("No square {}".format((x, y)))
+        if grid.get_state(x, y) != Ship.NULL:
+            raise SessionError("Square {} has already been shot".format((x, y)))
+
+        result = grid.process_shot(x, y)
+        sunk = None
+        if result == Ship.SUNK:
+            sunk = grid.get_sunk_ship(x, y)
+            if grid.all_sunk():
+                self.winner = player
+        elif result == Ship.MISS:
+            self.turn = 1 - player
+
+        return ShotOutcome(player, x, y, result, sunk)
+
+    def get_ai_to_play(self):
+        '''Return the player whose turn it is, if played by an AI, else None.'''
+
+        if self.get_phase() == GameSession.PLAYING and self.turn in self.ais:
+            return self.turn
+
+    def play_ai_shot(self):
+        '''Fire one shot of the AI whose turn it is. Return its ShotOutcome.'''
+
+        player = self.get_ai_to_play()
+        assert player is not None
+
+        ai = self.ais[player]
+        x, y = ai.get_shot()
+        outcome = self.shoot(player, x, y)
+        ai.set_shot_result(outcome.result)
+        return outcome
@@ -1,9 +1,13 @@
 from collections import OrderedDict
 import itertools
+import random
 from six.moves import filter
 from sys import stdout
 
 from ship_model import Ship
+from rules import CLASSIC
+from placement_index import BOARD_SIZE, get_index
+from square_pool import SquarePool
 
 
 class GridModel(object):
@@ -16,17 +20,28 @@ class GridModel(object):
             Used by opponent to query status
         * _coords:
             maps squares on which ships are placed to name of ship placed there
+            this is always up to date, so ships can be looked up by square in any phase
         * _ships:
             maps name of ship to Ship object (containing location info)
             this is always up to date
+        * _unshot:
+            SquarePool of the squares which have not been fired upon
+            built when first needed, then kept up to date
+        * _parity:
+            maps modulus to the list of SquarePools of unshot squares with (x + y) % modulus == 0, 1, ...
+        * rules:
+            the board size and fleet of the game
     '''
     
-    # this is more-or-less static
-    SIZE = 10
+    # size of the classic board, each grid has its own SIZE
+    SIZE = BOARD_SIZE
     
-    def __init__(self):
-        '''Create a new grid model.'''
+    def __init__(self, rules=CLASSIC):
+        '''Create a new grid model for a game with the given rules.'''
     
+        self.rules = rules
+        self.SIZE = rules.size
+        self._index = get_index(rules)
         self.reset()
     
     def reset(self):
@@ -34,17 +49,15 @@ class GridModel(object):
         self._coords = {}
         self._finalized = False
         self._state_dict = OrderedDict()
+        self._unshot = None
+        self._parity = {}
         
     def finalize(self, error_check=True):
-        '''Create data structures that are costly to create but useful for ship lookup during second half of game.
+        '''End ship placement. From now on, only sunk ships are considered when adding ships.
         <code>error_check</code> determines whether to make sure the grid is correct. Usually on, off for debugging.'''
     
         if error_check:
-            assert len(self._ships) == len(Ship.SHIPS)
-        
-        for ship_name, s in self._ships.items():
-            for sq in s.get_covering_squares():
-                self._coords[sq] = ship_name
+            assert len(self._ships) == len(self.rules.fleet)
         
         self._finalized = True
         
@@ -52,16 +65,16 @@ class GridModel(object):
         '''Return sunk ship at (x, y).
         If ship is not sunk, return None.'''
         
-        s = self._ships[self._coords[(x, y)]]
-        if s.is_sunk():
+        s = self.get_ship_at(x, y)
+        if s is not None and s.is_sunk():
             return s
             
     def get_ship_at(self, x, y):
-        '''Return the ship at the given coordinates.
-        Try not to abuse this.'''
+        '''Return the ship at the given coordinates, or None.'''
         
-        if (x, y) in self._coords:
-            return self._ships[self._coords[(x, y)]]
+        name = self._coords.get((x, y))
+        if name is not None:
+            return self._ships[name]
         
     def process_shot(self, x, y):
         '''Process shooting the given square.
@@ -84,23 +97,69 @@ class GridModel(object):
                 result = Ship.HIT
             
         self._state_dict[sq] = result
+        self._mark_shot(sq)
         #print "[GRID] {} -> {}".format(sq, Ship.SHOT_RESULTS[self._state_dict[sq]])
         return result
+
+    def record_shot(self, x, y, result, sunk_ship=None):
+        '''Record the result of a shot on a grid whose ships are not known, such as the opponent's
+        grid in a game played on a server. <sunk_ship> is the Ship sunk by the shot, if any:
+        it is added to the grid, with all its squares hit.'''
+
+        sq = (x, y)
+        if sunk_ship is not None:
+            self._place(sunk_ship, self._get_placement(sunk_ship))
+            for p_sq in sunk_ship.get_covering_squares():
+                sunk_ship.mark(*p_sq)
+                self._state_dict[p_sq] = Ship.SUNK
+
+        self._state_dict[sq] = result
+        self._mark_shot(sq)
         
     def all_sunk(self):
         '''Return True iff all the ships on this grid have been sunk.'''
         
         return all([s.is_sunk() for s in self._ships.values()])
         
+    def _mark_shot(self, sq):
+        '''Take the square out of the unshot squares.'''
+        
+        if self._unshot is not None:
+            self._unshot.discard(sq)
+            for modulus, pools in self._parity.items():
+                pools[(sq[0] + sq[1]) % modulus].discard(sq)
+        
     def get_null_squares(self):
         '''Return the set of all squares that have not yet been fired upon.
-        Actually returns an itertools object.'''
+        Actually returns a SquarePool, which is kept up to date and must not be modified.'''
+        
+        if self._unshot is None:
+            all_squares = itertools.product(range(self.SIZE), range(self.SIZE))
+            self._unshot = SquarePool(filter(self.is_empty_square, all_squares))
+        return self._unshot
+    
+    def get_parity_squares(self, parity, modulus=2):
+        '''Return the unshot squares (x, y) with (x + y) % modulus == parity, as a SquarePool
+        which is kept up to date and must not be modified.
+        With modulus 2, these are the two colours of a checkerboard: when hunting, a ship of length
+        <modulus> or more always covers a square of each class.'''
+        
+        if modulus not in self._parity:
+            pools = [SquarePool() for i in range(modulus)]
+            for sq in self.get_null_squares():
+                pools[(sq[0] + sq[1]) % modulus].add(sq)
+            self._parity[modulus] = pools
+        return self._parity[modulus][parity]
+    
+    def random_null_square(self, rng=random, parity=None, modulus=2):
+        '''Return an unshot square chosen uniformly at random, or None if there is none.
+        If <parity> is given, only choose among the squares of get_parity_squares(parity, modulus).
+        <rng> is the random.Random instance (or module) to use.'''
         
-        all_squares = itertools.product(range(self.SIZE), range(self.SIZE))
-        #print tuple(all_squares)
-        l = filter(self.is_empty_square, all_squares)
-        #print tuple(l)
-        return l
+        if parity is None:
+            return self.get_null_squares().choice(rng)
+        else:
+            return self.get_parity_squares(parity, modulus).choice(rng)
     
     def get_state(self, x, y):
         '''Return state of given square.'''
@@ -131,18 +190,36 @@ class GridModel(object):
             - when placing initially, consider secret ships
             - when constructing model of opponent, hide secret ships'''
     
-        for other_name, other_ship in self._ships.items():
-            # ignore unsunk ships once ship placement is finalized
-            if self._finalized and not other_ship.is_sunk():
-                continue
-        
+        p = self._get_placement(s)
+        return p is not None and self.can_add_placement(p, s.get_short_name())
+
+    def _get_placement(self, s):
+        '''Return the placement of ship <s> on this grid, or None if it does not fit.'''
+
+        p = s.get_placement()
+        if p.index is not self._index:
+            # a ship made for other rules
+            return self._index.get_ship_placement(s)
+        if p.id is not None:
+            return p
+
+    def can_add_placement(self, p, ship=None):
+        '''Whether the given placement (from the placement index) of the ship <ship> can be added to the grid.
+        <ship> may be None for a ship which is not on the grid, such as one of the opponent's unsunk ships.'''
+
+        for sq in p.squares:
+            other_name = self._coords.get(sq)
+            
             # can overlap with itself
-            if other_name == s.get_name():
+            if other_name is None or other_name == ship:
                 continue
-                
+            
+            # ignore unsunk ships once ship placement is finalized
+            if self._finalized and not self._ships[other_name].is_sunk():
+                continue
+            
             # conflicts with another ship
-            if s.intersects_with(other_ship):
-                return False
+            return False
         
         # no conflict
         return True
@@ -150,7 +227,7 @@ class GridModel(object):
     def can_add(self, s):
         '''Wether the given ship *object* can be added to the grid.'''
 
-        return all([self.is_valid_square(x, y) for x, y in s.get_covering_squares()]) and self._can_add_ship(s)
+        return self._can_add_ship(s)
         
     
     def can_add_ship(self, x, y, ship, vertical):
@@ -159,8 +236,8 @@ class GridModel(object):
             - when placing initially, consider secret ships
             - when constructing model of opponent, hide secret ships'''
             
-        s = Ship(x, y, ship, vertical)
-        return self.can_add(s)
+        p = self._index.get(ship, x, y, vertical)
+        return p is not None and self.can_add_placement(p, ship)
     
     def remove_ship(self, remove_name):
         '''Remove the ship with given name'''
@@ -168,41 +245,90 @@ class GridModel(object):
         if remove_name not in self._ships:
             return False
         else:
-            del(self._ships[remove_name])
+            self._unplace(remove_name)
             return True
 
+    def _place(self, s, p):
+        '''Put ship <s> at placement <p> in the ship and square lookups.
+        Replaces the ship with the same name, if any (when a ship is moved or rotated).'''
+
+        name = s.get_short_name()
+        self._unplace(name)
+        self._ships[name] = s
+        for sq in p.squares:
+            self._coords[sq] = name
+
+    def _unplace(self, name):
+        '''Take the ship called <name> out of the ship and square lookups, if it is there.'''
+
+        s = self._ships.pop(name, None)
+        if s is not None:
+            for sq in s.get_covering_squares():
+                # squares of unsunk ships may be shared once finalized
+                if self._coords.get(sq) == name:
+                    del self._coords[sq]
+
     def add(self, s):
         '''Add the given ship *object*.'''
 
-        added = False
-
-        if self.can_add(s):
-            self._ships[s.get_short_name()] = s
-            added = True
+        p = self._get_placement(s)
+        if p is None or not self.can_add_placement(p, s.get_short_name()):
+            return False
 
-        return added
+        self._place(s, p)
+        return True
     
     def add_ship(self, x, y, ship, vertical):
         '''Add a new ship, or change orientation of existing ship.'''
         
-        s = Ship(x, y, ship, vertical)
+        s = self.rules.make_ship(x, y, ship, vertical)
         return self.add(s)
         
     def has_all_ships(self):
         '''Return True iff the grid has all ships placed.'''
         
-        return len(self._ships) == 5
+        return len(self._ships) == len(self.rules.fleet)
         
     def read_json(self, obj):
         '''Read configuration from JSON object.'''
-        
+
         pass
-        
+
+    def restore(self, ships, shots):
+        '''Set up the grid of a saved game in one pass, rather than adding ships and replaying shots.
+        <ships> maps name of ship to [x, y, vertical], <shots> is the list of squares fired upon, in order
+        (as in battleship.json).
+        Raise ValueError if the ships cannot be placed.'''
+
+        self.reset()
+        for name, (x, y, vertical) in ships.items():
+            s = self.rules.make_ship(x, y, str(name), vertical)
+            if not self.add(s):
+                raise ValueError("Cannot place ship {} at {}".format(name, (x, y)))
+        self.finalize(error_check=False)
+        self._restore_shots([tuple(sq) for sq in shots])
+
+    def _restore_shots(self, shots):
+        '''Mark the <shots> on the ships and the state, then set the squares of sunk ships once.'''
+
+        for sq in shots:
+            name = self._coords.get(sq)
+            if name is None:
+                self._state_dict[sq] = Ship.MISS
+            else:
+                self._ships[name].mark(*sq)
+                self._state_dict[sq] = Ship.HIT
+
+        for s in self._ships.values():
+            if s.is_sunk():
+                for sq in s.get_covering_squares():
+                    self._state_dict[sq] = Ship.SUNK
+
     def get_ship_placement(self):
         '''Return dictionary for the ship placement on this board.
         Structure: {<ship_short_name> : [x, y, vertical (T/F)], ... }'''
         
-        return {name: [ship._x, ship._y, ship.is_vertical()] for name, ship in self._ships.items()}
+        return {name: [ship.coords()[0], ship.coords()[1], ship.is_vertical()] for name, ship in self._ships.items()}
         
     def get_ships(self):
         '''Return a mapping of ship name to ship object: {str ==> Ship}
@@ -241,7 +367,8 @@ class GridModel(object):
         '''Write the configuration of this model to the given open file.'''
     
         for ship in self._ships.values():
-            line = "%s %d %d %s" % (ship.get_name(), ship._x, ship._y, ship._get_str_v()[0])
+            x, y = ship.coords()
+            line = "%s %d %d %s" % (ship.get_name(), x, y, ship._get_str_v()[0])
             f.write(line + "\n")
     
     def write(self, fname):
@@ -337,18 +464,19 @@ class GridAsciiDrawer(object):
         if mode is None:
             mode = self.SHOW_PLACEMENT_ONLY
         
-        for row in range(10):
-            for col in range(10):
-                sq = (col, row)
-                ship = grid._coords[sq] if sq in grid._coords else None
+        for row in range(grid.SIZE):
+            for col in range(grid.SIZE):
+                s = grid.get_ship_at(col, row)
+                ship = s.get_short_name() if s is not None else None
+                state = grid.get_state(col, row)
                 
-                if sq in grid._state_dict:
+                if state != Ship.NULL:
                     c = {
                         Ship.MISS : self.get_miss_ship_char,
                         Ship.HIT : self.get_hit_ship_char,
                         Ship.SUNK : self.get_sunk_ship_char
-                    } [grid._state_dict[sq]](ship, mode)
-                elif sq in grid._coords:
+                    } [state](ship, mode)
+                elif ship is not None:
                     c = self.get_hidden_ship_char(ship, mode)
                 else:
                     c = self.get_empty_char(mode)
@@ -0,0 +1,129 @@
+'''
+A game of battleship with no UI, for simulations.
+Does not import Tk.
+'''
+
+from __future__ import print_function
+from collections import namedtuple
+import os
+import random
+import time
+
+from ship_model import Ship, ShipLoader
+from grid_model import GridModel
+from rules import CLASSIC
+from ship_ai import ShipAI
+from monte_carlo_ai import MonteCarloShipAI
+from numpy_ship_ai import NumpyShipAI
+
+STAT_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "ai", "stat")
+
+# AI strategies by name
+AI_CLASSES = {
+    "density" : ShipAI,
+    "montecarlo" : MonteCarloShipAI,
+    "numpy" : NumpyShipAI
+}
+
+
+class GameResult(namedtuple("GameResult", ["winner", "shots", "turn_times", "hits"])):
+    '''Outcome of a headless game.
+    <shots> is the number of shots fired by each player, <turn_times> the time taken by every AI shot
+    (choosing it and processing its result) in seconds, and <hits> the squares each player hit.'''
+
+    __slots__ = ()
+
+
+def load_fleet(fname):
+    '''Return the list of ships in the given ship configuration file, ready to add to a grid.'''
+
+    return ShipLoader.read(fname)
+
+
+class HeadlessGame(object):
+    '''A game between two players, with no UI.
+
+    Player 0 always plays an AI. Player 1 is either another AI (AI vs AI) or a fixed fleet which
+    never shoots (AI vs placements). As in GameController.shot_square, a player keeps shooting
+    until they miss.'''
+
+    def __init__(self, ai_class=ShipAI, fleet=None, stat_file=None, opponent_class=None, rules=CLASSIC):
+        '''Set up a new game with the given rules.
+        <fleet> is a list of Ship objects for player 1. If None, player 1 is an AI as well,
+        of class <opponent_class> (same as player 0 by default).
+        The AIs start from the stat model in <stat_file>, by default ai/stat for the classic rules.
+        With no stat model, they start from the ship placements alone.'''
+
+        if opponent_class is None:
+            opponent_class = ai_class
+        if stat_file is None and rules == CLASSIC:
+            stat_file = STAT_FILE
+
+        self.grids = [GridModel(rules), GridModel(rules)]
+        self.ais = [ai_class(self.grids[0], self.grids[1])]
+        self.hits = [[], []]
+
+        if fleet is None:
+            self.ais.append(opponent_class(self.grids[1], self.grids[0]))
+        else:
+            for s in fleet:
+                # fresh ship, since ships keep track of their own hits
+                s = rules.make_ship(s.coords()[0], s.coords()[1], s.get_short_name(), s.is_vertical())
+                assert self.grids[1].add(s) # always have to load valid configuration
+
+        for ai in self.ais:
+            if stat_file is not None:
+                ai.read_stat_model(stat_file)
+            assert ai.place_ships()
+
+        for grid in self.grids:
+            grid.finalize()
+
+    def play_turn(self, player):
+        '''Let <player> shoot until they miss or win.
+        Return the time taken by each shot.'''
+
+        ai = self.ais[player]
+        enemy_grid = self.grids[1 - player]
+        times = []
+        result = Ship.NULL
+
+        while result != Ship.MISS and not enemy_grid.all_sunk():
+            start = time.time()
+            shot = ai.get_shot()
+            result = enemy_grid.process_shot(*shot)
+            ai.set_shot_result(result)
+            times.append(time.time() - start)
+
+            if result != Ship.MISS:
+                self.hits[player].append(shot)
+
+        return times
+
+    def play(self, first_player=0):
+        '''Play the game to the end, starting with <first_player>. Return its GameResult.'''
+
+        turn_times = []
+        shots = [0, 0]
+        player = first_player if len(self.ais) > 1 else 0
+
+        while True:
+            times = self.play_turn(player)
+            turn_times.extend(times)
+            shots[player] += len(times)
+
+            if self.grids[1 - player].all_sunk():
+                return GameResult(player, shots, turn_times, self.hits)
+
+            if len(self.ais) > 1:
+                player = 1 - player
+
+
+def play_games(n, ai_class=ShipAI, fleet=None, seed=None, rules=CLASSIC):
+    '''Play <n> headless games with the given rules. Yield the GameResult of each.'''
+
+    if seed is not None:
+        random.seed(seed)
+
+    for i in range(n):
+        yield HeadlessGame(ai_class, fleet, rules=rules).play()
@@ -0,0 +1,231 @@
+'''
+Optional per-phase timing and allocation instrumentation.
+Wrap methods with instrument(), and dump the registry with REGISTRY.dump().
+Allocations are traced with tracemalloc (Python 3 only), once start_tracing() has been called.
+'''
+
+from __future__ import print_function
+from collections import OrderedDict
+import functools
+import sys
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2: allocations are not recorded
+    tracemalloc = None
+
+
+def start_tracing():
+    '''Start tracing memory allocations, if tracemalloc is available.
+    Return whether allocations are traced.'''
+
+    if tracemalloc is None:
+        return False
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return True
+
+
+def _traced_bytes():
+    '''Return the size in bytes of the memory currently traced by tracemalloc,
+    or None if allocations are not traced.'''
+
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return None
+
+
+class Histogram(object):
+    '''Histogram of values, with buckets whose upper bounds double from <first_bound>.'''
+
+    def __init__(self, first_bound, bucket_count=16):
+        self.bounds = [first_bound * 2 ** i for i in range(bucket_count)]
+        self.buckets = [0] * (bucket_count + 1) # last bucket is for everything larger
+        self.count = 0
+        self.total = 0
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def mean(self):
+        if self.count == 0:
+            return 0
+        return float(self.total) / self.count
+
+    def percentile(self, p):
+        '''Return the upper bound of the bucket holding the <p>th percentile (0-100).
+        Never more than the largest value seen.'''
+
+        target = p / 100.0 * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_json(self):
+        return {
+            "count" : self.count,
+            "total" : self.total,
+            "max" : self.max,
+            "bounds" : self.bounds,
+            "buckets" : self.buckets
+        }
+
+
+class PhaseStats(object):
+    '''Statistics of one instrumented phase: wall-clock time (ms) and net allocated bytes per call.
+    Allocations are only counted for the calls in which they could be measured.'''
+
+    def __init__(self):
+        self.calls = 0
+        self.times = Histogram(0.01)
+        self.allocations = Histogram(64)
+
+    def add(self, seconds, allocations=None):
+        self.calls += 1
+        self.times.add(seconds * 1000)
+        if allocations is not None:
+            self.allocations.add(max(allocations, 0))
+
+    def to_json(self):
+        return {
+            "calls" : self.calls,
+            "time_ms" : self.times.to_json(),
+            "allocated_bytes" : self.allocations.to_json() if self.allocations.count else None
+        }
+
+
+class Registry(object):
+    '''In-memory registry of PhaseStats, by phase name.
+    Phases may be recorded from several threads.
+
+    Below are data representations:
+        * _phases:
+            ordered dict mapping phase name to its PhaseStats
+        * _active:
+            maps each instrumented call in progress to [id of its thread, whether a call on another thread overlapped it]
+            allocations are traced for the whole process, so they are not attributed to overlapping calls
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._phases = OrderedDict()
+
+    def enter(self):
+        '''Mark the start of an instrumented call on this thread.
+        Return a token to pass to leave().'''
+
+        token = object()
+        thread_id = threading.current_thread().ident
+        with self._lock:
+            overlapped = False
+            for call in self._active.values():
+                if call[0] != thread_id:
+                    call[1] = True
+                    overlapped = True
+            self._active[token] = [thread_id, overlapped]
+        return token
+
+    def leave(self, token):
+        '''Mark the end of the call started with enter().
+        Return whether a call on another thread ran at the same time.'''
+
+        with self._lock:
+            return self._active.pop(token)[1]
+
+    def record(self, phase, seconds, allocations=None):
+        '''Record one call of <phase>, which took <seconds> and allocated <allocations> bytes
+        (None if not measured).'''
+
+        with self._lock:
+            if phase not in self._phases:
+                self._phases[phase] = PhaseStats()
+            self._phases[phase].add(seconds, allocations)
+
+    def get(self, phase):
+        with self._lock:
+            return self._phases.get(phase)
+
+    def to_json(self):
+        with self._lock:
+            return {phase : stats.to_json() for phase, stats in self._phases.items()}
+
+    def dump(self, f=None):
+        '''Write a summary of every phase to <f> (stdout by default).'''
+
+        if f is None:
+            f = sys.stdout
+
+        lines = ["{:<35} {:>8} {:>10} {:>10} {:>10} {:>10} {:>14}\n".format(
+            "phase", "calls", "mean ms", "p50 ms", "p99 ms", "max ms", "mean alloc KB")]
+        with self._lock:
+            for phase, stats in self._phases.items():
+                if stats.allocations.count:
+                    allocations = "{:.1f}".format(stats.allocations.mean() / 1024)
+                else:
+                    allocations = "n/a"
+                lines.append("{:<35} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>14}\n".format(
+                    phase,
+                    stats.calls,
+                    stats.times.mean(),
+                    stats.times.percentile(50),
+                    stats.times.percentile(99),
+                    stats.times.max,
+                    allocations))
+
+        for line in lines:
+            f.write(line)
+
+
+REGISTRY = Registry()
+
+
+def instrument(obj, method_name, phase=None, registry=REGISTRY):
+    '''Replace the method <method_name> of the object <obj> with one that records
+    each call in <registry>, under <phase> (by default the class and method name).
+    Allocations are only recorded once start_tracing() has been called.'''
+
+    fn = getattr(obj, method_name)
+    if phase is None:
+        phase = "{}.{}".format(type(obj).__name__, method_name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = registry.enter()
+        traced = _traced_bytes()
+        start = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.time() - start
+            allocations = None
+            if traced is not None:
+                now_traced = _traced_bytes()
+                if now_traced is not None:
+                    allocations = now_traced - traced
+            if registry.leave(token):
+                allocations = None
+            registry.record(phase, seconds, allocations)
+
+    setattr(obj, method_name, wrapper)
@@ -0,0 +1,234 @@
+'''
+Learn the AI's opening stat model from the ship placements of archived games.
+
+Streams every JSON game under saves/ and saves/autosaves/, and counts how often human players
+put a ship on each square. Writes the counts as an ai/stat compatible file, and a richer
+per-ship, per-orientation prior as JSON. The JSON prior also records the size and modification
+time of every file read, and the ID of every game counted, so the next run only reads new or
+changed files, and does not count a game twice. The games are streamed one at a time: besides
+these records, memory use does not depend on the number of games.
+
+Note that a game saved before game IDs were added to saves is counted again when its file changes.
+
+Examples:
+    python learn_prior.py
+    python learn_prior.py -o ai/stat
+    python learn_prior.py --full
+'''
+
+from __future__ import print_function
+import argparse
+import json
+import os
+
+from ship_model import Ship
+from grid_model import GridModel
+from placement_index import INDEX
+
+try:
+    from os import scandir
+except ImportError:
+    # Python 2: use the scandir backport, if installed
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+SAVE_DIRS = [
+    os.path.join(BASE_DIR, "saves"),
+    os.path.join(BASE_DIR, "saves", "autosaves")
+]
+DEFAULT_STAT_FILE = os.path.join(BASE_DIR, "ai", "stat_learned")
+DEFAULT_PRIOR_FILE = os.path.join(BASE_DIR, "ai", "prior.json")
+
+# largest value in the learned ai/stat file
+STAT_SCALE = 99
+
+
+def empty_table():
+    '''Return a SIZE x SIZE table of zeros, indexed [x][y].'''
+
+    return [[0] * GridModel.SIZE for x in range(GridModel.SIZE)]
+
+
+class Prior(object):
+    '''Counts of ship placements over many games.
+
+    Below are data representations (tables are indexed [x][y]):
+        * occupancy:
+            how often a ship covered each square
+        * ships:
+            maps ship name to {"vertical": table, "horizontal": table}, counting the placements
+            of that ship by their origin square
+        * games, skipped:
+            how many games were counted, and how many files could not be read
+        * files:
+            maps the path of every file read (relative to BASE_DIR) to [size, mtime] when it was read
+        * game_ids:
+            set of the IDs of the games counted
+    '''
+
+    def __init__(self):
+        self.games = 0
+        self.skipped = 0
+        self.files = {}
+        self.game_ids = set()
+        self.occupancy = empty_table()
+        self.ships = {ship: {"vertical": empty_table(), "horizontal": empty_table()} for ship in Ship.SHORT_NAMES}
+
+    @staticmethod
+    def read(fname):
+        '''Read a prior from the JSON file written by write().'''
+
+        with open(fname) as fp:
+            obj = json.load(fp)
+
+        if "files" not in obj:
+            raise ValueError("{} was written by an older version, which did not record the files read".format(fname))
+
+        prior = Prior()
+        for key in ["games", "skipped", "files", "occupancy", "ships"]:
+            setattr(prior, key, obj[key])
+        prior.game_ids = set(obj["game_ids"])
+        return prior
+
+    def write(self, fname):
+        with open(fname, "w") as fp:
+            json.dump({
+                "games" : self.games,
+                "skipped" : self.skipped,
+                "files" : self.files,
+                "game_ids" : sorted(self.game_ids),
+                "occupancy" : self.occupancy,
+                "ships" : self.ships
+            }, fp, separators=(',', ':'))
+
+    def add_game(self, obj):
+        '''Count the human ship placements of one parsed battleship.json document.
+        Return False if the placement is not valid.'''
+
+        placements = []
+        for ship_name, coords in obj["battleship"]["human"]["ships"].items():
+            p = INDEX.get(str(ship_name), coords[0], coords[1], coords[2])
+            if p is None:
+                return False
+            placements.append((str(ship_name), p))
+
+        for ship, p in placements:
+            for x, y in p.squares:
+                self.occupancy[x][y] += 1
+            orientation = "vertical" if p.vertical else "horizontal"
+            self.ships[ship][orientation][p.x][p.y] += 1
+
+        self.games += 1
+        return True
+
+    def add_file(self, fname, size, mtime):
+        '''Count the game saved in the given file, of <size> bytes modified at <mtime>,
+        unless that game was already counted.'''
+
+        self.files[_file_key(fname)] = [size, mtime]
+
+        try:
+            with open(fname) as fp:
+                obj = json.load(fp)
+            game_id = obj["battleship"].get("game_id")
+            if game_id is not None and game_id in self.game_ids:
+                # saved again, or copied
+                return
+            counted = self.add_game(obj)
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+            counted = False
+
+        if not counted:
+            self.skipped += 1
+        elif game_id is not None:
+            self.game_ids.add(game_id)
+
+    def write_stat_model(self, fname):
+        '''Write the occupancy as an ai/stat compatible file, scaled so the largest value is STAT_SCALE.'''
+
+        top = max(max(column) for column in self.occupancy)
+        with open(fname, "w") as f:
+            for column in self.occupancy:
+                # same layout as ShipAI.write_stat_model: one line per x, values padded to 3 characters
+                line = ""
+                for occ in column:
+                    val = int(round(STAT_SCALE * float(occ) / top)) if top > 0 else 0
+                    line += str(val).ljust(3) + " "
+                f.write(line.strip() + "\n")
+
+
+def _file_key(path):
+    '''Return the key of the file <path> in Prior.files.'''
+
+    return os.path.relpath(path, BASE_DIR)
+
+
+def iter_new_games(dirs, files):
+    '''Yield (path, size, mtime) of every JSON file in <dirs> which is not in <files>
+    (as Prior.files) with the same size and modification time.'''
+
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        for path, size, mtime in _iter_json_files(d):
+            if files.get(_file_key(path)) != [size, mtime]:
+                yield path, size, mtime
+
+
+def _iter_json_files(d):
+    '''Yield (path, size, mtime) of every JSON file in the directory <d>.'''
+
+    if scandir is not None:
+        # scandir does not build the list of all files in memory
+        for entry in scandir(d):
+            if entry.name.endswith(".json") and entry.is_file():
+                st = entry.stat()
+                yield entry.path, st.st_size, st.st_mtime
+    else:
+        for name in os.listdir(d):
+            path = os.path.join(d, name)
+            if name.endswith(".json") and os.path.isfile(path):
+                st = os.stat(path)
+                yield path, st.st_size, st.st_mtime
+
+
+def learn(dirs=SAVE_DIRS, prior=None):
+    '''Add the games in <dirs> which <prior> has not counted yet. Return the updated prior.'''
+
+    if prior is None:
+        prior = Prior()
+
+    for path, size, mtime in iter_new_games(dirs, prior.files):
+        prior.add_file(path, size, mtime)
+
+    return prior
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Learn the AI's opening stat model from saved games.")
+    parser.add_argument("-o", "--output", default=DEFAULT_STAT_FILE, help="ai/stat compatible file to write (default: %(default)s)")
+    parser.add_argument("--prior", default=DEFAULT_PRIOR_FILE, help="per-ship prior to update (default: %(default)s)")
+    parser.add_argument("--full", action="store_true", help="ignore the existing prior and read every game again")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.prior) and not args.full:
+        try:
+            prior = Prior.read(args.prior)
+        except ValueError as e:
+            parser.error("{}: run again with --full".format(e))
+    else:
+        prior = Prior()
+
+    games, skipped = prior.games, prior.skipped
+    learn(SAVE_DIRS, prior)
+    print("{} new games, {} files skipped, {} games in total".format(prior.games - games, prior.skipped - skipped, prior.games))
+
+    prior.write(args.prior)
+    prior.write_stat_model(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -141,6 +141,9 @@ class Game(Frame):
             self.dev_menu.add_command(label="Auto Load")
             self.menus["dev_auto_load"] = count
             count += 1
+            self.dev_menu.add_command(label="Dump Timings")
+            self.menus["dev_dump_timings"] = count
+            count += 1
             menubar.add_cascade(label="Dev", menu=self.dev_menu)
         
         help_menu = Menu(menubar, tearoff=0)
@@ -380,8 +383,9 @@ class Game(Frame):
         self.play_game_button = Button(button_frame, text="Play")
         self.play_game_button.pack(side=LEFT, padx=self.BUTTON_PADDING, pady=self.BUTTON_PADDING)
         
-    def redraw(self):
+    def redraw(self, tiles=True):
         '''Redraw the GUI, reloading all info from the model.
+        <tiles> determines whether to redraw the grids too, False when they were just restored.
         TODO this is a work-in-progress'''
         
         # first, figure out the state
@@ -394,8 +398,9 @@ class Game(Frame):
         self.their_grid_frame.ship_panel.redraw(grids[1])
         
         # set the grid to the correct state
-        self.my_grid.redraw(grids[0])
-        self.their_grid.redraw(grids[1])
+        if tiles:
+            self.my_grid.redraw(grids[0])
+            self.their_grid.redraw(grids[1])
         
         if all([g.has_all_ships() for g in grids]) and all([g.all_sunk() for g in grids]):
             #TODO
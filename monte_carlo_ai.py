@@ -0,0 +1,216 @@
+'''
+Battleship AI which samples whole fleets consistent with the shots so far.
+'''
+
+import time
+
+from ship_model import Ship
+from placement_index import square_bit
+from ship_ai import ShipAI
+
+
+class MonteCarloShipAI(ShipAI):
+    '''Battleship AI which samples complete fleet layouts consistent with the enemy grid,
+    and shoots at the unshot square covered by the most samples.
+
+    Samples are kept between turns. After every shot, only the samples that the shot
+    contradicts are dropped, and the set is topped up again. Both happen when the next shot
+    is picked, within the time budget. If no sample can be found in time, falls back to the
+    stat model of ShipAI.
+
+    Below are data representations:
+        * _samples:
+            list of (placements, mask), where placements maps the name of each ship
+            that was unsunk at sampling time to its Placement, and mask covers all of them
+        * _counts:
+            maps square to the number of samples covering it
+        * _misses, _hits, _sunk:
+            bitmasks of what is known about the enemy grid
+        * _pending:
+            list of the tests a sample has to pass to be kept, since the samples were last pruned
+        * _reserve:
+            most time in seconds a turn has spent outside of sampling and pruning (picking the shot
+            and processing its result), kept out of the time for sampling
+        * _sampled_at:
+            time.time() when sampling ended in the last turn
+    '''
+
+    SAMPLE_COUNT = 2000
+    TIME_BUDGET = 0.05 # seconds per turn
+
+    # how many fleets to try between two checks of the clock
+    ATTEMPTS_PER_CHECK = 8
+
+    def __init__(self, home_grid_model=None, enemy_grid_model=None, sample_count=SAMPLE_COUNT, time_budget=TIME_BUDGET, seed=None, rules=None):
+        '''Create a new AI.
+        <sample_count> is the number of fleets to keep, <time_budget> is the most time in seconds to
+        spend per turn (from get_shot to the end of set_shot_result), and <seed> seeds the sampler
+        (drawn from the random module by default).'''
+
+        self._sample_count = sample_count
+        self._time_budget = time_budget
+        ShipAI.__init__(self, home_grid_model, enemy_grid_model, seed=seed, rules=rules)
+
+    def reset(self):
+        ShipAI.reset(self)
+        self._samples = []
+        self._counts = {sq: 0 for sq in self._index.covering}
+        self._misses = 0
+        self._hits = 0
+        self._sunk = 0
+        self._pending = []
+        self._reserve = 0
+        self._sampled_at = None
+
+    def _sample_fleet(self, candidates):
+        '''Try to sample one fleet of unsunk ships uniformly from <candidates>
+        (maps ship name to its possible placements).
+        Return (placements, mask), or None if the attempt is rejected.'''
+
+        placements = {}
+        mask = 0
+
+        for ship, ship_candidates in candidates.items():
+            p = self._random.choice(ship_candidates)
+            if p.mask & mask:
+                return None
+            placements[ship] = p
+            mask |= p.mask
+
+        # every hit on an unsunk ship has to be explained
+        if self._hits & ~mask:
+            return None
+
+        return (placements, mask)
+
+    def _add_sample(self, sample):
+        self._samples.append(sample)
+        self._count_sample(sample, 1)
+
+    def _count_sample(self, sample, n):
+        '''Add <n> to the counts of the squares covered by <sample>.'''
+
+        counts = self._counts
+        for p in sample[0].values():
+            for sq in p.squares:
+                counts[sq] += n
+
+    def _is_possible(self, sample):
+        '''Whether no ship of <sample> lies on hit squares only: such a ship would have been sunk.'''
+
+        hits = self._hits
+        for p in sample[0].values():
+            if not p.mask & ~hits:
+                return False
+        return True
+
+    def fill_samples(self, deadline=None):
+        '''Sample fleets until there are enough of them, or <deadline> (as returned by time.time()) has passed,
+        by default the time budget from now.'''
+
+        if len(self._samples) >= self._sample_count:
+            return
+        if deadline is None:
+            deadline = time.time() + self._time_budget
+
+        blocked = self._misses | self._sunk
+        hits = self._hits
+        candidates = {}
+        for ship in self._unsunk_ships:
+            # an unsunk ship lies on at least one square which is not a known hit
+            candidates[ship] = [p for p in self._index.by_ship[ship] if not p.mask & blocked and p.mask & ~hits]
+            if not candidates[ship]:
+                return
+
+        attempts = 0
+
+        while len(self._samples) < self._sample_count:
+            sample = self._sample_fleet(candidates)
+            if sample is not None:
+                self._add_sample(sample)
+
+            attempts += 1
+            if attempts % self.ATTEMPTS_PER_CHECK == 0 and time.time() > deadline:
+                break
+
+    def prune_samples(self, keep):
+        '''Drop all the samples for which <keep>(sample) is False.'''
+
+        kept = []
+        dropped = []
+        for sample in self._samples:
+            if keep(sample):
+                kept.append(sample)
+            else:
+                dropped.append(sample)
+
+        if len(dropped) > len(kept):
+            # cheaper to count the kept samples again
+            self._counts = {sq: 0 for sq in self._index.covering}
+            for sample in kept:
+                self._count_sample(sample, 1)
+        else:
+            for sample in dropped:
+                self._count_sample(sample, -1)
+        self._samples = kept
+
+    def _apply_pending(self):
+        '''Drop the samples contradicted by the shots since the last call.'''
+
+        if self._pending:
+            tests = self._pending
+            self._pending = []
+            self.prune_samples(lambda sample: all(test(sample) for test in tests))
+
+    def get_shot(self):
+        # pruning and sampling share what the rest of the turn leaves of its time budget
+        deadline = time.time() + self._time_budget - self._reserve
+        self._apply_pending()
+        self.fill_samples(deadline)
+        self._sampled_at = time.time()
+
+        if not self._samples:
+            return ShipAI.get_shot(self)
+
+        shot = self._misses | self._hits | self._sunk
+        max_val = 0
+        best_shots = []
+
+        for x in range(self._rules.size):
+            for y in range(self._rules.size):
+                if shot & square_bit(x, y, self._rules.size) or self._counts[(x, y)] < max_val or self._counts[(x, y)] == 0:
+                    continue
+                if self._counts[(x, y)] > max_val:
+                    max_val = self._counts[(x, y)]
+                    best_shots = []
+                best_shots.append((x, y))
+
+        best_shot = self._break_tie(best_shots) if best_shots else None
+        self._prev_shot = best_shot
+        return best_shot
+
+    def set_shot_result(self, result):
+        ShipAI.set_shot_result(self, result)
+
+        if self._prev_shot is None:
+            return
+
+        bit = square_bit(self._prev_shot[0], self._prev_shot[1], self._rules.size)
+
+        if result == Ship.MISS:
+            self._misses |= bit
+            self._pending.append(lambda sample: not sample[1] & bit)
+        elif result == Ship.HIT:
+            self._hits |= bit
+            self._pending.append(lambda sample: sample[1] & bit)
+            self._pending.append(self._is_possible)
+        elif result == Ship.SUNK:
+            s = self._enemy_model.get_sunk_ship(*self._prev_shot)
+            p = self._index.get_ship_placement(s)
+            self._hits &= ~p.mask
+            self._sunk |= p.mask
+            self._pending.append(lambda sample: sample[0][s.get_name()] is p)
+
+        if self._sampled_at is not None:
+            self._reserve = min(max(self._reserve, time.time() - self._sampled_at), self._time_budget)
+            self._sampled_at = None
@@ -0,0 +1,115 @@
+'''
+ShipAI backed by NumPy arrays, for large batch simulations.
+NumPy is optional: the rest of the game does not need it.
+'''
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ship_model import Ship
+from placement_index import INDEX
+from ship_ai import ShipAI
+from stat_cache import load_stat_model
+
+
+class PlacementMatrix(object):
+    '''The placement index as NumPy arrays, one per ship length.
+    Together they are a sparse form of the placements x squares incidence matrix.
+
+    Below are data representations (square (x, y) is x * SIZE + y):
+        * squares:
+            maps ship length to the placements x length array of the squares each placement covers
+    '''
+
+    def __init__(self, index=INDEX):
+        self.size = index.size
+        self.squares = {}
+
+        for length, placements in index.by_length.items():
+            squares = [x * index.size + y for p in placements for x, y in p.squares]
+            self.squares[length] = np.array(squares, dtype=np.intp).reshape(len(placements), length)
+
+
+# maps placement index to its matrix
+_matrices = {}
+
+
+def get_placement_matrix(index=INDEX):
+    '''Return the placement matrix of the given index, building it on first use.'''
+
+    if index not in _matrices:
+        _matrices[index] = PlacementMatrix(index)
+    return _matrices[index]
+
+
+class NumpyShipAI(ShipAI):
+    '''ShipAI which keeps the stat model in a SIZE x SIZE array indexed by [x, y],
+    and computes the whole model with a few matrix operations.
+    Expects the enemy grid to be finalized, as it is during play.'''
+
+    def __init__(self, home_grid_model=None, enemy_grid_model=None, random_ties=True, seed=None, rules=None):
+        if np is None:
+            raise ImportError("NumpyShipAI requires numpy")
+
+        ShipAI.__init__(self, home_grid_model, enemy_grid_model, incremental=False, random_ties=random_ties, seed=seed, rules=rules)
+
+    def reset(self):
+        ShipAI.reset(self)
+        # empty until a stat model is loaded or made
+        self._probs = np.zeros((0, 0), dtype=np.int64)
+
+    def read_stat_model(self, fname):
+        '''Load the statistical model from disk, as a read-only array over the shared model.
+        make_stat_model replaces it with a new array.'''
+
+        model = load_stat_model(fname)
+        self._probs = np.frombuffer(model.get_buffer(), dtype=np.intc).reshape(model.size, model.size)
+
+    def get_shot(self):
+        if self._probs.size == 0:
+            self.make_stat_model()
+
+        max_val = self._probs.max()
+
+        if max_val > 0:
+            squares = [divmod(int(i), self._rules.size) for i in np.flatnonzero(self._probs == max_val)]
+            best_shot = self._break_tie(squares)
+        else:
+            best_shot = None
+
+        self._prev_shot = best_shot
+        return best_shot
+
+    def _get_state_array(self):
+        '''Return the state of every square of the enemy grid, as a flat array.'''
+
+        size = self._rules.size
+        state = np.zeros(size * size, dtype=np.int64)
+        for x, y in self._enemy_model.get_shots():
+            state[x * size + y] = self._enemy_model.get_state(x, y)
+        return state
+
+    def make_stat_model(self):
+        '''(re)compute the statistical model from scratch.
+        Same model as ShipAI.make_stat_model: a placement is valid when it covers no miss or sunk square,
+        and weighs 1 plus 5 for every hit it covers.'''
+
+        size = self._rules.size
+        m = get_placement_matrix(self._index)
+        state = self._get_state_array()
+
+        blocked = (state == Ship.MISS) | (state == Ship.SUNK)
+        hits = (state == Ship.HIT).astype(np.int64)
+        density = np.zeros(size * size, dtype=np.int64)
+
+        for length, count in self._unsunk_lengths.items():
+            if count == 0:
+                continue
+            squares = m.squares[length]
+            valid = ~blocked[squares].any(axis=1)
+            weights = (1 + 5 * hits[squares].sum(axis=1)) * valid * count
+            density += np.bincount(squares.ravel(), weights=np.repeat(weights, length), minlength=size * size).astype(np.int64)
+
+        self._probs = np.where(state == Ship.NULL, density, -state).reshape(size, size)
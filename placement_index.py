@@ -0,0 +1,192 @@
+'''
+Index of every possible ship placement on the grid.
+Built once per set of rules, and shared by the grid models and the AI.
+
+Placements only depend on the length of a ship, so all the ships of the same length share them.
+This keeps the index small for large fleets.
+'''
+
+from ship_model import Placement, Ship
+from rules import CLASSIC, Rules
+
+# this is more-or-less static
+BOARD_SIZE = CLASSIC.size
+
+# above this many squares, placement masks are computed when needed instead of stored
+MASK_AREA_LIMIT = 64 * 64
+
+
+def square_bit(x, y, size=BOARD_SIZE):
+    '''Return the bit representing square (x, y).'''
+
+    return 1 << (y * size + x)
+
+
+def iter_bits(mask, size=BOARD_SIZE):
+    '''Yield the squares (x, y) whose bits are set in <mask>.'''
+
+    while mask:
+        low = mask & -mask
+        i = low.bit_length() - 1
+        yield (i % size, i // size)
+        mask ^= low
+
+
+class LargePlacement(Placement):
+    '''Placement on a large grid. The mask is computed every time, as storing the masks
+    of every placement would take memory quadratic in the area of the grid.'''
+
+    __slots__ = ()
+
+    @property
+    def mask(self):
+        mask = 0
+        for x, y in self.squares:
+            mask |= 1 << (y * self.index.size + x)
+        return mask
+
+
+class PlacementIndex(object):
+    '''All the in-bounds placements of every ship on a grid.
+
+    Below are data representations:
+        * placements:
+            list of every Placement, the position in the list is the placement's id
+        * by_length:
+            maps ship length to the list of its placements
+        * by_ship:
+            maps short name of ship to the list of its placements (shared with by_length)
+        * covering:
+            maps square to the list of placements covering it
+        * ships:
+            maps short name of ship to its length
+    '''
+
+    def __init__(self, size=BOARD_SIZE, ships=None):
+        '''Build the index for a square grid of side <size>.
+        <ships> maps the short name of each ship to its length, the classic fleet by default.'''
+
+        if ships is None:
+            ships = CLASSIC.fleet
+
+        self.size = size
+        self.ships = ships
+        self.placements = []
+        self.by_length = {}
+        # squares are shared by all the placements covering them
+        self._squares = [[(x, y) for y in range(size)] for x in range(size)]
+        self.covering = {sq: [] for column in self._squares for sq in column}
+        # maps (length, vertical) to the list of placements, indexed by x * size + y
+        self._positions = {}
+
+        for length in sorted(set(ships.values()), reverse=True):
+            self._add_length(length)
+
+        self.by_ship = {ship: self.by_length[length] for ship, length in ships.items()}
+
+    def _add_length(self, length):
+        '''Add all the placements of the given length.'''
+
+        size = self.size
+        large = size * size > MASK_AREA_LIMIT
+        placements = self.by_length[length] = []
+        positions = {True: [None] * (size * size), False: [None] * (size * size)}
+        self._positions.update({(length, v): positions[v] for v in positions})
+
+        for x in range(size):
+            for y in range(size):
+                for v in [True, False]:
+                    if (v and y + length > size) or (not v and x + length > size):
+                        continue
+
+                    if v:
+                        squares = tuple(self._squares[x][y + i] for i in range(length))
+                    else:
+                        squares = tuple(self._squares[x + i][y] for i in range(length))
+
+                    if large:
+                        p = LargePlacement(self, len(self.placements), length, x, y, v, squares)
+                    else:
+                        p = Placement(self, len(self.placements), length, x, y, v, squares)
+                        p.mask = 0
+                        for sq in squares:
+                            p.mask |= square_bit(sq[0], sq[1], size)
+
+                    self.placements.append(p)
+                    placements.append(p)
+                    for sq in squares:
+                        self.covering[sq].append(p)
+                    positions[v][x * size + y] = p
+
+    def get(self, ship, x, y, vertical):
+        '''Return the placement of <ship> rooted at (x, y).
+        Return None if there is no such placement (out of bounds or unknown ship).'''
+
+        length = self.ships.get(ship)
+        if length is None or not (0 <= x < self.size and 0 <= y < self.size):
+            return None
+        return self._positions[(length, bool(vertical))][x * self.size + y]
+
+    def get_placement(self, length, x, y, vertical):
+        '''Return the placement of a ship of <length> rooted at (x, y).
+        If the ship does not fit on the board, return a new placement with no id and no mask.'''
+
+        positions = self._positions.get((length, bool(vertical)))
+        if positions is not None and 0 <= x < self.size and 0 <= y < self.size:
+            p = positions[x * self.size + y]
+            if p is not None:
+                return p
+
+        if not length:
+            squares = ()
+        elif vertical:
+            squares = tuple((x, y + i) for i in range(length))
+        else:
+            squares = tuple((x + i, y) for i in range(length))
+        p = Placement(self, None, length, x, y, bool(vertical), squares)
+        p.mask = None
+        return p
+
+    def make_ship(self, ship, x, y, vertical):
+        '''Return a new Ship object for the ship with the given short name, holding its placement in this index.'''
+
+        length = self.ships.get(ship)
+        return Ship(type=ship, placement=self.get_placement(length, x, y, vertical))
+
+    def get_ship_placement(self, s):
+        '''Return the placement for the given ship *object*, or None if it does not fit on the board.
+        Ships made for these rules hold their placement already; others (such as a classic Ship
+        on a custom board) are looked up by their squares.'''
+
+        p = s.get_placement()
+        if p.index is not self:
+            p = self.get(s.get_short_name(), p.x, p.y, p.vertical)
+            if p is None or p.length != s.get_size():
+                return None
+        if p.id is not None:
+            return p
+
+    def __reduce__(self):
+        # the same index is used again when unpickled, such as in another worker process
+        return (_find_index, (self.size, tuple(self.ships.items())))
+
+
+# maps rules to their index
+_indexes = {}
+
+
+def get_index(rules):
+    '''Return the placement index for the given rules. Indexes are built once, when first needed.'''
+
+    if rules not in _indexes:
+        _indexes[rules] = PlacementIndex(rules.size, rules.fleet)
+    return _indexes[rules]
+
+
+def _find_index(size, ships):
+    '''Return the index for a board of side <size> and the ships in the tuple of (short name, length) <ships>.'''
+
+    return get_index(Rules(size, [(ship, ship, length) for ship, length in ships]))
+
+
+INDEX = get_index(CLASSIC)
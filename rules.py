@@ -0,0 +1,65 @@
+'''
+Board dimensions and fleet composition of a game.
+'''
+
+from collections import OrderedDict
+
+from ship_model import Ship
+
+
+class Rules(object):
+    '''The rules of a game: the side of the (square) board, and the ships in the fleet.
+
+    Below are data representations:
+        * fleet:
+            ordered mapping of ship short name to ship length
+        * names:
+            maps ship short name to full name
+    '''
+
+    def __init__(self, size=10, fleet=None):
+        '''Create new rules.
+        <fleet> is the list of (short name, full name, length) of every ship. Classic fleet by default.'''
+
+        if fleet is None:
+            fleet = [(ship, Ship.NAMES[ship], Ship.SIZES[ship]) for ship in Ship.SHORT_NAMES]
+
+        self.size = size
+        self.fleet = OrderedDict((short_name, length) for short_name, full_name, length in fleet)
+        self.names = {short_name: full_name for short_name, full_name, length in fleet}
+
+        for length in self.fleet.values():
+            assert 0 < length <= size
+
+    @staticmethod
+    def generate(size, lengths):
+        '''Return rules for a board of side <size>, with one ship for each of the given <lengths>.
+        Ships are named s1, s2, ...'''
+
+        return Rules(size, [("s%d" % (i + 1), "ship %d" % (i + 1), length) for i, length in enumerate(lengths)])
+
+    def make_ship(self, x, y, ship, vertical):
+        '''Return a new Ship object for the ship with the given short name, holding its placement on this board.'''
+
+        # imported here, as the placement index imports the classic rules from this module
+        from placement_index import get_index
+        return get_index(self).make_ship(ship, x, y, vertical)
+
+    def _key(self):
+        return (self.size, tuple(self.fleet.items()))
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        return "Rules %dx%d with %d ships" % (self.size, self.size, len(self.fleet))
+
+
+# the classic game
+CLASSIC = Rules()
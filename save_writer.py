@@ -0,0 +1,154 @@
+'''
+Writes save files on a background thread, so slow disks do not freeze the UI.
+Does not import Tk: results are collected by the UI thread with poll(), such as from an after() loop.
+'''
+
+from collections import OrderedDict
+import json
+import os
+import threading
+
+from six.moves import queue
+
+
+def replace_file(src, dst):
+    '''Rename <src> to <dst>, replacing <dst> if it exists.
+    Atomic, except on Windows under Python 2, which has no os.replace.'''
+
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        # rename replaces <dst> on POSIX, but fails if it exists on Windows
+        if os.name == "nt" and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def write_atomic(fname, data):
+    '''Write the string <data> to <fname> through a temporary file, so readers never see a partial file.'''
+
+    head, tail = os.path.split(fname)
+    if head and not os.path.isdir(head):
+        os.makedirs(head)
+
+    tmp = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+        with open(tmp, "w") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        replace_file(tmp, fname)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class SaveWriter(object):
+    '''Background writer of JSON save files.
+
+    Saves to a file which is still waiting to be written are coalesced: only the newest
+    document is written, once. At most <max_pending> files wait at a time, further saves
+    block until one is written.
+
+    Below are data representations:
+        * _pending:
+            maps file name to (document, whether to write it on one line, list of callbacks),
+            in the order they were first saved
+        * _done:
+            queue of (file name, error or None, callbacks) of finished writes, for poll()
+    '''
+
+    MAX_PENDING = 8
+
+    def __init__(self, indent=None, max_pending=MAX_PENDING):
+        '''Create a writer, and start its thread.
+        <indent> is the JSON indent of the files, None for compact files.'''
+
+        self._indent = indent
+        self._max_pending = max_pending
+        self._pending = OrderedDict()
+        self._done = queue.Queue()
+        self._cond = threading.Condition()
+        self._closed = False
+        # file being written right now, if any
+        self._busy = None
+
+        self._thread = threading.Thread(target=self._run, name="SaveWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _dumps(self, obj, compact=False):
+        if compact or self._indent is None:
+            return json.dumps(obj, separators=(',', ':'))
+        else:
+            return json.dumps(obj, indent=self._indent, separators=(',', ': '))
+
+    def save(self, fname, obj, callback=None, compact=False):
+        '''Queue the document <obj> to be written to <fname>. <obj> must not be modified afterwards.
+        <callback>(error) is called by poll() once the file is written, with None on success.
+        <compact> writes the document on a single line, whatever the indent of the writer.'''
+
+        with self._cond:
+            while fname not in self._pending and len(self._pending) >= self._max_pending:
+                self._cond.wait()
+
+            if fname in self._pending:
+                callbacks = self._pending[fname][2]
+            else:
+                callbacks = []
+            if callback is not None:
+                callbacks.append(callback)
+            self._pending[fname] = (obj, compact, callbacks)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                fname, (obj, compact, callbacks) = self._pending.popitem(last=False)
+                self._busy = fname
+                self._cond.notify_all()
+
+            try:
+                write_atomic(fname, self._dumps(obj, compact))
+                error = None
+            except (IOError, OSError, TypeError, ValueError) as e:
+                error = e
+
+            # reported before flush() returns
+            self._done.put((fname, error, callbacks))
+            with self._cond:
+                self._busy = None
+                self._cond.notify_all()
+
+    def poll(self):
+        '''Return the list of (file name, error or None) of the writes finished since the last call,
+        after calling their callbacks. Call this from the UI thread.'''
+
+        results = []
+        while True:
+            try:
+                fname, error, callbacks = self._done.get_nowait()
+            except queue.Empty:
+                return results
+            for callback in callbacks:
+                callback(error)
+            results.append((fname, error))
+
+    def flush(self):
+        '''Wait until every queued save is written, and ready to be reported by poll().'''
+
+        with self._cond:
+            while self._pending or self._busy is not None:
+                self._cond.wait()
+
+    def close(self):
+        '''Write the queued saves, then stop the thread.'''
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -9,6 +9,11 @@ import random
 
 from ship_model import Ship
 from grid_model import GridModel
+from rules import CLASSIC
+from placement_index import get_index
+from density_map import DensityMap
+from fleet_generator import FleetGenerator
+from stat_cache import load_stat_model
 
 def min_number():
     '''Return system's most negative int.'''
@@ -18,14 +23,32 @@ class ShipAI(object):
     '''A naive battleship AI.'''
 
 
-    def __init__(self, home_grid_model=None, enemy_grid_model=None):
+    def __init__(self, home_grid_model=None, enemy_grid_model=None, incremental=True, random_ties=True, seed=None, rules=None):
+        '''Create a new AI.
+        <rules> are the rules of the game, by default those of the enemy grid model (or the classic rules).
+        <incremental> determines whether the stat model is updated only around each shot,
+        rather than recomputed from scratch. Both give the same model.
+        <random_ties> determines whether a tie between best shots is broken by a random choice,
+        rather than by taking the first square (by x, then y).
+        <seed> seeds the AI's random choices (drawn from the random module by default).'''
+        
+        if rules is None:
+            rules = CLASSIC if enemy_grid_model is None else enemy_grid_model.rules
         if enemy_grid_model is None:
-            enemy_grid_model = GridModel()
+            enemy_grid_model = GridModel(rules)
         if home_grid_model is None:
-            home_grid_model = GridModel()
+            home_grid_model = GridModel(rules)
         
+        self._rules = rules
+        self._index = get_index(rules)
         self._enemy_model = enemy_grid_model
         self._home_model = home_grid_model
+        self._incremental = incremental
+        self._random_ties = random_ties
+        if seed is None:
+            # so that seeding the random module also seeds this AI
+            seed = random.getrandbits(64)
+        self._random = random.Random(seed)
         self.reset()
         
     def _place_ships_based_on_stat_model(self):
@@ -37,30 +60,22 @@ class ShipAI(object):
 
         for val in sorted(self._d.keys()):
             for root in self._d[val]:
-                for ship in filter(lambda s: s not in self._placements, Ship.SHORT_NAMES):
+                for ship in filter(lambda s: s not in self._placements, self._rules.fleet):
                     if self.try_place_max_prob(root, ship):
-                        if len(self._placements) == 5:
+                        if len(self._placements) == len(self._rules.fleet):
                             return True
                         # break here, because no point adding different ship to same place
                         break
         
     def _place_ships_randomly(self):
-        '''Place ships completely randomly.
-        This method does not look at probabilities. Just picks random spots.'''
-        
-        valid_squares = set(zip(range(GridModel.SIZE), range(GridModel.SIZE)))
-        i = 0
-        
-        while i < len(Ship.SHORT_NAMES) and len(valid_squares) > 0:
-            sq = random.sample(valid_squares, 1)[0] #note that Python does not support random.choice for sets
-            v = random.choice([True, False])
-            ship = Ship(x=sq[0], y=sq[1], type=Ship.SHORT_NAMES[i], vertical=v)
-            # try to place this ship
-            if self.try_place_ship(ship):
-                i += 1
-                valid_squares.difference_update(set(ship.get_covering_squares()))
+        '''Place ships completely randomly, uniformly over all legal layouts.
+        This method does not look at probabilities.'''
+        
+        generator = FleetGenerator(index=self._index, rng=self._random)
+        for ship, p in zip(generator.ships, generator.sample()):
+            self.try_place_ship(p.make_ship(ship))
                 
-        return len(self._placements) == len(Ship.SHORT_NAMES)
+        return len(self._placements) == len(self._rules.fleet)
         
     def place_ships(self):
         '''Place the ships on the grid.
@@ -97,8 +112,8 @@ class ShipAI(object):
         Return the result.'''
 
         ships = [
-            Ship(root[0], root[1], ship, True),
-            Ship(root[0], root[1], ship, False)
+            self._rules.make_ship(root[0], root[1], ship, True),
+            self._rules.make_ship(root[0], root[1], ship, False)
         ]
 
         for s in sorted(ships, key=self.get_ship_prob):
@@ -136,7 +151,7 @@ class ShipAI(object):
     def load_probs(self, fname):
         '''Load probabilities from a file.'''
         
-        self._probs = {}
+        self._probs = DensityMap()
         f = open(fname)
         
         for y, line in enumerate(f):
@@ -147,74 +162,160 @@ class ShipAI(object):
             
     def reset(self):
         self._prev_shot = None
-        self._probs = {}
-        self._unsunk_ships = list(Ship.SIZES.keys())
+        self._probs = DensityMap()
+        self._unsunk_ships = list(self._rules.fleet.keys())
+        # maps ship length to the number of unsunk ships of that length
+        self._unsunk_lengths = {}
+        for ship in self._unsunk_ships:
+            length = self._rules.fleet[ship]
+            self._unsunk_lengths[length] = self._unsunk_lengths.get(length, 0) + 1
+        # per-placement weights and per-square sums of them, see make_stat_model
+        self._weights = None
+        self._density = None
+
+    def restore(self):
+        '''Catch up with the shots already on the enemy grid, such as when a saved game is loaded:
+        the sunk ships are taken out, and the stat model is made once.'''
+
+        self.reset()
+        for s in self._enemy_model.get_ships().values():
+            if s.is_sunk():
+                self._unsunk_ships.remove(s.get_name())
+                self._unsunk_lengths[s.get_size()] -= 1
+        self.make_stat_model()
+
+    def _break_tie(self, squares):
+        '''Return the shot to take among the equally good <squares>.'''
+        
+        if self._random_ties:
+            # no need to sort: the order of a set of squares only depends on how it was built,
+            # so the choice is still reproducible, and it stays cheap when many squares tie
+            return self._random.choice(tuple(squares))
+        else:
+            return min(squares)
         
     def get_shot(self):
-        max_val = 0
-        best_shot = None
-    
-        for x in range(GridModel.SIZE):
-            for y in range(GridModel.SIZE):
-                if self._probs[(x, y)] > max_val:
-                    best_shot = (x, y)
-                    max_val = self._probs[best_shot]
+        if len(self._probs) == 0:
+            # no stat model was loaded, start from the placements alone
+            self.make_stat_model()
+        
+        max_val, squares = self._probs.get_max()
+        
+        if squares:
+            best_shot = self._break_tie(squares)
+        else:
+            best_shot = None
                     
         self._prev_shot = best_shot
         return best_shot
         
     def set_shot_result(self, result):
+        sunk_ship = None
+        
         if result == Ship.SUNK and self._prev_shot is not None:
             # have to re-check whole initial bit of stat model
             # necessary to set sunk ship squares properly
             s = self._enemy_model.get_sunk_ship(*self._prev_shot)
             self._unsunk_ships.remove(s.get_name())
-            # margin = s.get_size()
+            self._unsunk_lengths[s.get_size()] -= 1
+            sunk_ship = s.get_name()
+            squares = s.get_covering_squares()
         else:
-            pass
-            # margin = 5
-        # remake the stat model around this ship
-        #x - margin, x + margin, y - margin, y + margin)
-        self.make_stat_model()
+            squares = [self._prev_shot]
+            
+        if self._incremental and self._weights is not None and self._prev_shot is not None:
+            # remake the stat model around this shot (or ship)
+            self.update_stat_model(squares, sunk_ship)
+        else:
+            self.make_stat_model()
         
-    def _prelim_mark_stat_model_square(self, x, y):
+    def _mark_stat_model_square(self, x, y):
         state = self._enemy_model.get_state(x, y)
                 
         if state == Ship.NULL:
-            self._probs[(x, y)] = 0
+            self._probs[(x, y)] = self._density[(x, y)]
         else:
             # mark as negative
             # allow for some distinguishing marks between hit and miss
             self._probs[(x, y)] = state * -1
         
-    def prelim_mark_stat_model(self):
-        for x in range(GridModel.SIZE):
-            for y in range(GridModel.SIZE):
-                self._prelim_mark_stat_model_square(x, y)
+    def mark_stat_model(self):
+        for x in range(self._rules.size):
+            for y in range(self._rules.size):
+                self._mark_stat_model_square(x, y)
         
-    def make_stat_model(self):#, x_start=0, x_end=GridModel.SIZE, y_start=0, y_end=GridModel.SIZE):
-        '''(re)compute the statistical model in the given range.'''
+    def make_stat_model(self):
+        '''(re)compute the statistical model from scratch.
+        Every placement gets a weight, and the model of an unshot square is the sum of the
+        weights of the placements covering it, counted once per unsunk ship of their length.'''
         
-        # initialize all squares
-        self.prelim_mark_stat_model()
+        self._weights = [0] * len(self._index.placements)
+        self._density = {sq: 0 for sq in self._index.covering}
     
-        for x in range(0, GridModel.SIZE):
-            for y in range(0, GridModel.SIZE):
+        for length, count in self._unsunk_lengths.items():
+            if count > 0:
+                for p in self._index.by_length[length]:
+                    self.add_placement_to_stat_model(p, count)
+                
+        self.mark_stat_model()
+        
+    def update_stat_model(self, squares, sunk_ship=None):
+        '''Update the statistical model after a shot, without recomputing it.
+        <squares> are the squares whose state changed.
+        <sunk_ship> is the name of the ship that was just sunk, if any.
+        Only the placements covering those squares can change weight, and the placements
+        of the sunk ship's length now count once less.'''
+        
+        changed = set(squares)
+        placements = set()
+        
+        for sq in squares:
+            placements.update(self._index.covering[sq])
+        if sunk_ship is not None:
+            for p in self._index.by_length[self._rules.fleet[sunk_ship]]:
+                w = self._weights[p.id]
+                if w != 0:
+                    for sq in p.squares:
+                        self._density[sq] -= w
+                    changed.update(p.squares)
+        
+        for p in placements:
+            w = self._get_placement_weight(p)
+            delta = w - self._weights[p.id]
+            if delta != 0:
+                self._weights[p.id] = w
+                count = self._unsunk_lengths[p.length]
+                if count > 0:
+                    for sq in p.squares:
+                        self._density[sq] += delta * count
+                    changed.update(p.squares)
+                
+        for sq in changed:
+            self._mark_stat_model_square(*sq)
             
-                for ship in self._unsunk_ships:
-                    for v in [True, False]:
-                        s = Ship(x, y, ship, v)
-                        self.add_ship_to_stat_model(s)
+    def _get_placement_weight(self, p):
+        '''Return the weight of the given placement for one unsunk ship, in the current state of the game.'''
+        
+        w = self.get_placement_stat_weight(p)
+        if w > 0 and not self._enemy_model.can_add_placement(p):
+            return 0
+        return w
                 
     def get_ship_stat_weight(self, s):
+        p = self._index.get_ship_placement(s)
+        if p is None:
+            return 0
+        return self.get_placement_stat_weight(p)
+        
+    def get_placement_stat_weight(self, p):
         w = 1
     
-        for sq in s.get_covering_squares():
+        for sq in p.squares:
             state = self._enemy_model.get_state(*sq)
             
             # means this configuration is impossible
             # contribute nothing to probability of that spot
-            if state in [Ship.SUNK, Ship.MISS]:
+            if state == Ship.SUNK or state == Ship.MISS:
                 return 0
             elif state == Ship.HIT:
                 w += 5 # add bonus for every hit
@@ -225,37 +326,38 @@ class ShipAI(object):
         '''Add a given *hypothetical* ship to the statistical model.
         More hits along a ship count for more likelihood that it is real.'''
     
-        # first, can the grid add the ship?
-        if self._enemy_model.can_add_ship(s._x, s._y, s.get_name(), s._vertical):
-            # next, can the statistical model add the ship?
-            squares = s.get_covering_squares()
-            if all([self._enemy_model.get_state(*sq) not in [Ship.MISS, Ship.SUNK] for sq in squares]):
-                w = self.get_ship_stat_weight(s)
-            
-                for sq in squares:
-                    if self._probs[sq] >= 0:
-                        self._probs[sq] += w
-                return True
+        p = self._index.get_ship_placement(s)
+        return p is not None and self.add_placement_to_stat_model(p)
+        
+    def add_placement_to_stat_model(self, p, count=1):
+        '''Add a *hypothetical* placement from the placement index to the statistical model,
+        for <count> ships of its length.'''
+    
+        # first, can the statistical model add the ship? (cheaper to check)
+        w = self.get_placement_stat_weight(p)
+        # next, can the grid add the ship?
+        if w > 0 and self._enemy_model.can_add_placement(p):
+            self._weights[p.id] = w
+            for sq in p.squares:
+                self._density[sq] += w * count
+            return True
             
         return False
         
     def read_stat_model(self, fname):
-        f = open(fname)
-        
-        for x, line in enumerate(f):
-            for y, val in enumerate(line.split()):
-                self._probs[(x, y)] = int(val)
+        '''Load the statistical model from disk.
+        The file is only parsed once per process: this AI gets a copy-on-write view of the shared model.'''
         
-        f.close()
+        self._probs = DensityMap(load_stat_model(fname).view())
         
     def show_stat_model(self):
         self._write_stat_model(stdout)
         
     def _write_stat_model(self, f):
-        for x in range(GridModel.SIZE):
+        for x in range(self._rules.size):
             line = ""
         
-            for y in range(GridModel.SIZE):
+            for y in range(self._rules.size):
                 line += str(self._probs[(x, y)]).ljust(3) + " "
             f.write(line.strip() + "\n")
         
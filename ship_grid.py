@@ -6,14 +6,41 @@ March 4, 2013
 from six.moves.tkinter import Canvas, NORMAL, DISABLED
 from ship_model import Ship
 from grid_model import GridModel
+from rules import CLASSIC
+
+
+def column_name(x):
+    '''Return the label of column <x>: a to z, then aa, ab, ... as in a spreadsheet.'''
+
+    name = ""
+    x += 1
+    while x > 0:
+        x, rem = divmod(x - 1, 26)
+        name = chr(97 + rem) + name
+    return name
+
 
 class ShipGrid(Canvas):
     '''The UI manager for a player's grid in a game of battleship.
-    Takes on the role of view, but also Controller.'''
+    Takes on the role of view, but also Controller.
+    
+    Tiles are not drawn as soon as their state changes: they are marked dirty, and all the dirty
+    tiles are drawn at once when Tk is next idle, so a whole AI turn or a load draws once.
+    
+    Below are data representations:
+        * _tiles:
+            maps Tkinter ID of tile to its coordinates
+        * _coords:
+            maps coordinates of tile to its Tkinter ID
+        * _dirty:
+            maps Tkinter ID of tile to the state it must be drawn in on the next flush
+        * _flush_id:
+            ID of the scheduled flush, None if none is scheduled
+    '''
 
     ############## geometry ############
     RECT_SIZE = 30
-    GRID_SIZE = 10
+    GRID_SIZE = CLASSIC.size # each grid has its own GRID_SIZE, from its rules
     GRID_X_OFFSET = 25
     GRID_Y_OFFSET = 25
     ####################################
@@ -24,18 +51,33 @@ class ShipGrid(Canvas):
     RECT_HIT_FILL = "red"
     RECT_SUNK_FILL = "powder blue"
     RECT_PLACED_FILL = "forest green"
+    
+    FILL_COLORS = {
+        Ship.NULL : RECT_NULL_FILL,
+        Ship.MISS : RECT_MISS_FILL,
+        Ship.HIT : RECT_HIT_FILL,
+        Ship.SUNK : RECT_SUNK_FILL,
+        Ship.OTHER : RECT_PLACED_FILL
+    }
     ####################################
+    
+    # tag of the tiles which have not been disabled one by one, see enable
+    ENABLED_TAG = "enabled"
 
-    def __init__(self, master, home=False):
-        '''Create a new grid. home determines if this is your grid or the opponent's.'''
+    def __init__(self, master, home=False, rules=CLASSIC):
+        '''Create a new grid. home determines if this is your grid or the opponent's.
+        <rules> are the rules of the game.'''
     
         Canvas.__init__(self, master)
         
+        self.GRID_SIZE = rules.size
         self.size = self.GRID_SIZE * self.RECT_SIZE + 2 * max(self.GRID_X_OFFSET, self.GRID_Y_OFFSET)
         self.config(height=self.size, width=self.size)
         
         self._home = home
-        self._model = GridModel()
+        self._model = GridModel(rules)
+        self._dirty = {}
+        self._flush_id = None
         
         self._make_grid()
         self.reset()
@@ -75,33 +117,67 @@ class ShipGrid(Canvas):
         
         return result
         
+    def record_shot(self, x, y, result, sunk_ship=None):
+        '''Show the result of a shot decided elsewhere, such as by a game server, and record it in the model
+        (see GridModel.record_shot). The tile is disabled.'''
+        
+        self._model.record_shot(x, y, result, sunk_ship)
+        if sunk_ship is not None:
+            for sq in sunk_ship.get_covering_squares():
+                self._set_tile_state(*sq)
+        else:
+            self._set_tile_state(x, y)
+        self.disable_tile(self._coords[(x, y)])
+        
     def disable(self):
         '''Disable all events on this grid.'''
         
-        for id in self._tiles.keys():
-            self._prev_state[id] = (self.itemcget(id, 'state') == NORMAL)
-            #if not self._prev_state[id]:
-                #print self._tiles[id]
-            self.itemconfig(id, state=DISABLED)
+        self.itemconfig("tile", state=DISABLED)
             
     def enable(self):
-        '''Re-enable the events on the grid.'''
+        '''Re-enable the events on the grid, on the tiles which have not been disabled one by one.'''
         
-        for id in self._tiles.keys():
-            if self._prev_state[id]:
-                self.itemconfig(id, state=NORMAL)
+        self.itemconfig(self.ENABLED_TAG, state=NORMAL)
+        
+    def disable_tile(self, id):
+        '''Disable the events on the tile with the given Tkinter ID, until the grid is reset.'''
+        
+        self.dtag(id, self.ENABLED_TAG)
+        self.itemconfig(id, state=DISABLED)
         
     def redraw(self, model):
-        '''Redraw the grid based on the model.
+        '''Redraw the grid based on the model, in one pass over the tiles.
         <model> is an instance of GridModel'''
         
-        # first, add ships
-        for ship_name, ship in model.get_ships().items():
-            self.add_ship_to_view(ship)
+        for (x, y) in self._coords:
+            self._set_tile_state(x, y, self._get_view_state(model, x, y))
             
-        # process missed shots (and hits as well)
-        for x, y in model.get_missed_shots():
-            self._set_tile_state(x, y, Ship.MISS)
+    def restore(self, ships, shots):
+        '''Set up the grid of a saved game: the model is built in one pass (see GridModel.restore),
+        then every tile is drawn once. Tiles already fired upon on the opponent's grid are disabled.
+        <ships> and <shots> are as in battleship.json.
+        Raise ValueError if the ships cannot be placed.'''
+        
+        self._model.restore(ships, shots)
+        
+        self.unbind("<Button>")
+        self._ships = {}
+        
+        self.addtag_withtag(self.ENABLED_TAG, "tile")
+        self.itemconfig("tile", state=NORMAL)
+        self.redraw(self._model)
+        if not self._home:
+            for x, y in self._model.get_shots():
+                self.disable_tile(self._coords[(x, y)])
+        
+    def _get_view_state(self, model, x, y):
+        '''Return the state to show for the tile at (x, y): the state of the square,
+        or OTHER for a ship not yet hit on the home grid.'''
+        
+        state = model.get_state(x, y)
+        if state == Ship.NULL and self._home and model.get_ship_at(x, y) is not None:
+            state = Ship.OTHER
+        return state
         
     def reset(self):
         '''Reset the grid to starting values.'''
@@ -117,13 +193,11 @@ class ShipGrid(Canvas):
         self.unbind("<Button>")
         
         self._ships = {}
-        self._prev_state = {} # this is only True for tiles disabled/enabled using disable and enable methods
         
-        # reset the squares
-        for id, (x, y) in self._tiles.items():
-            self._prev_state[id] = False 
-            self.itemconfig(id, state=NORMAL)
-            self._set_tile_state(x, y)
+        # reset the squares, all at once through their tags
+        self._dirty = {}
+        self.addtag_withtag(self.ENABLED_TAG, "tile")
+        self.itemconfig("tile", state=NORMAL, fill=self.FILL_COLORS[Ship.NULL])
             
     def add_ship_to_view(self, ship):
         '''Add a ship to the view. Do not update underlying model.
@@ -156,7 +230,7 @@ class ShipGrid(Canvas):
                 for sq in prev_ship.get_covering_squares():
                     self._set_tile_state(*sq) # reset state
             self._model.add_ship(x, y, ship, vertical)
-            s = Ship(x, y, ship, vertical)
+            s = self._model.rules.make_ship(x, y, ship, vertical)
             self.add_ship_to_view(s)
             
             if callback is not None:
@@ -165,33 +239,30 @@ class ShipGrid(Canvas):
         return result
         
     def _set_tile_state(self, x, y, state=None):
-        '''Set the tile state at (x, y).'''
+        '''Set the tile state at (x, y). The tile is drawn on the next flush.'''
     
         if state is None:
             state = self._model.get_state(x, y)
-        tag_id = self._get_tile_name(x, y)
-        id = self.find_withtag(tag_id)
-        
-        # set the label state
-        #if state == Ship.SUNK:
-        #    self.itemconfigure(id, text=self._model.get_ship(x, y))
-        #else:
-            #self.itemconfigure(id, text="")
+        self._dirty[self._coords[(x, y)]] = state
+        
+        if self._flush_id is None:
+            self._flush_id = self.after_idle(self.flush)
+        
+    def flush(self):
+        '''Draw the dirty tiles now.'''
+        
+        if self._flush_id is not None:
+            self.after_cancel(self._flush_id)
+            self._flush_id = None
             
-        # set the color
-        fill_colors = {
-            Ship.NULL : self.RECT_NULL_FILL,
-            Ship.MISS : self.RECT_MISS_FILL,
-            Ship.HIT : self.RECT_HIT_FILL,
-            Ship.SUNK : self.RECT_SUNK_FILL,
-            Ship.OTHER : self.RECT_PLACED_FILL
-        }
-        self.itemconfigure(id, fill=fill_colors[state])
+        dirty, self._dirty = self._dirty, {}
+        for id, state in dirty.items():
+            self.itemconfigure(id, fill=self.FILL_COLORS[state])
 
     def _get_tile_name(self, x, y):
         '''Return the tile's tag name, given its coordinates.'''
     
-        x_id = chr(97 + x) # here we assume GRID_SIZE <= 26
+        x_id = column_name(x)
         y_id = str(y + 1)
         return "tile%s%s" % (x_id, y_id)
 
@@ -209,7 +280,7 @@ class ShipGrid(Canvas):
         self._coords = {}
     
         for x in range(self.GRID_SIZE):
-            x_id = chr(97 + x) # here we assume GRID_SIZE <= 26
+            x_id = column_name(x)
         
             self.create_text(
                 self.GRID_X_OFFSET + (x + .5) * self.RECT_SIZE, 
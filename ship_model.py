@@ -2,7 +2,59 @@
 Written by Daniel Kats
 March 4, 2013
 '''
-            
+
+class Placement(object):
+    '''Immutable geometry of a ship of the given length rooted at (x, y), on the board of a placement index.
+    <squares> is the tuple of covered squares from the origin, <mask> the same squares as a bitmask
+    of the board. The placements on a board are built once by its index (see placement_index), and shared
+    by every ship and game using it, so they can be compared by identity. <id> is the position of the placement
+    in its index. A ship which does not fit on the board gets a placement of its own, with no id and no mask.'''
+
+    __slots__ = ("index", "id", "length", "x", "y", "vertical", "squares", "mask", "_square_set")
+
+    def __init__(self, index, id, length, x, y, vertical, squares):
+        self.index = index
+        self.id = id
+        self.length = length
+        self.x = x
+        self.y = y
+        self.vertical = vertical
+        self.squares = squares
+        self._square_set = None
+
+    @property
+    def square_set(self):
+        '''The covered squares as a frozenset, made when first needed.'''
+
+        if self._square_set is None:
+            self._square_set = frozenset(self.squares)
+        return self._square_set
+
+    def make_ship(self, ship):
+        '''Return a new Ship object with the given short name at this placement.'''
+
+        return Ship(type=ship, placement=self)
+
+    def __reduce__(self):
+        # placed again on the same index when unpickled, such as in another worker process
+        return (_get_placement, (self.index, self.length, self.x, self.y, self.vertical))
+
+    def __repr__(self):
+        return "Placement(%s, %s, %s, %s)" % (self.length, self.x, self.y, self.vertical)
+
+
+def _get_placement(index, length, x, y, vertical):
+    return index.get_placement(length, x, y, vertical)
+
+
+def _classic_index():
+    '''Return the placement index of the classic game.'''
+
+    # imported here, as the placement index is built from this module
+    from placement_index import INDEX
+    return INDEX
+
+
 class Ship(object):
     '''An object representing a ship in a game of Battleship.'''
 
@@ -59,37 +111,42 @@ class Ship(object):
                 Ship.HIT : "HIT",
                 Ship.SUNK : "SUNK"} [state]
 
-    def __init__(self, x=None, y=None, type=None, vertical=None):
+    # the geometry is shared, only the hits belong to this ship
+    __slots__ = ("_type", "_placement", "_hits")
+
+    def __init__(self, x=None, y=None, type=None, vertical=None, size=None, placement=None):
         '''Create a new ship with the given parameters.
+        <placement> is the ship's Placement on the board of its game (see Rules.make_ship), in which case
+        the other parameters but <type> are not needed. Otherwise, the ship is on the classic board, and
+        <size> is only needed for ships which are not part of the classic fleet.
         Throw assertion error if incorrect ship type given.'''
-    
-        self._x = x
-        self._y = y
+        
+        if placement is None:
+            if type is not None and size is None:
+                assert type in self.SIZES.keys()
+                size = Ship.SIZES[type]
+            placement = _classic_index().get_placement(size, x, y, vertical)
+        
         self._type = type
-        self._vertical = vertical
-        self._full_name = None
+        self._placement = placement
+        # bit i is set when the i-th square from the origin is hit
+        self._hits = 0
         
-        if self._type is not None:
-            assert self._type in self.SIZES.keys()
-            self._size = Ship.SIZES[self._type]
-            
-            for name in self.SHIPS:
-                if name.lower()[0] == self._type:
-                    self._full_name = name
-                    break
+    def get_placement(self):
+        '''Return the (shared, immutable) Placement of this ship.'''
         
-        self._hit = set([])
+        return self._placement
         
     def is_vertical(self):
         '''Return True iff this ship is oriented vertically.'''
     
-        return self._vertical
+        return self._placement.vertical
         
     def coords(self):
         '''Return coordinates of ship's root
         i.e. top or left square.'''
     
-        return (self._x, self._y)
+        return (self._placement.x, self._placement.y)
         
     def get_origin(self):
         '''Alias for coords.'''
@@ -99,42 +156,41 @@ class Ship(object):
     def get_size(self):
         '''Return the size (in number of tiles) of this ship.'''
     
-        return self._size
+        return self._placement.length
         
     def get_covering_squares(self):
-        '''Return the squares this ship covers.'''
+        '''Return the tuple of squares this ship covers.'''
         
-        if self._vertical:
-            return [(self._x, self._y + i) for i in range(self._size)]
-        else:
-            return [(self._x + i, self._y) for i in range(self._size)]
+        return self._placement.squares
             
     def get_covering_set(self):
-        '''Return the *set* of covering squares.'''
+        '''Return the *set* of covering squares (a frozenset).'''
         
-        return set(self.get_covering_squares())
+        return self._placement.square_set
         
     def get_hit_list(self):
         '''Return the list of hits as a boolean array.'''
         
-        return [coord in self._hit for coord in self.get_covering_squares()]
+        return [bool(self._hits >> i & 1) for i in range(self._placement.length)]
         
     def mark(self, x, y):
-        '''Mark the given spot as a hit.'''
+        '''Mark the given spot as a hit. Spots not covered by this ship are ignored.'''
     
-        self._hit.add((x, y))
+        p = self._placement
+        i = y - p.y if p.vertical else x - p.x
+        if 0 <= i < p.length and p.squares[i] == (x, y):
+            self._hits |= 1 << i
         
     def rotate(self):
         '''Change the orientation of this ship.'''
         
-        self._vertical = not self._vertical
+        p = self._placement
+        self._placement = p.index.get_placement(p.length, p.x, p.y, not p.vertical)
             
     def intersects_with(self, other):
         '''Return True iff this ship intersects with another ship.'''
     
-        s1 = self.get_covering_set()
-        s2 = other.get_covering_set()
-        return len(s1.intersection(s2)) > 0
+        return not self._placement.square_set.isdisjoint(other._placement.square_set)
         
     def get_name(self):
         '''Return the name of this ship.
@@ -150,21 +206,21 @@ class Ship(object):
     def get_full_name(self):
         '''Return full name for this ship.'''
         
-        return self._full_name
+        return Ship.NAMES.get(self._type)
         
     def is_sunk(self):
         '''Return True iff this ship is sunk.'''
     
-        return len(self._hit) == self._size
+        return self._hits == (1 << self._placement.length) - 1
         
     def _get_str_v(self):
-        if self._vertical:
+        if self._placement.vertical:
             return "vertical"
         else:
             return "horizontal"
         
     def __str__(self):
-        return "Ship %s @ %s oriented %sly" % (self._type, str((self._x, self._y)), self._get_str_v())
+        return "Ship %s @ %s oriented %sly" % (self._type, str(self.coords()), self._get_str_v())
             
 class ShipLoader(object):
     '''Load ship object from a file.'''
@@ -181,7 +237,7 @@ class ShipLoader(object):
             ship_type, x, y, v = line.strip().split()
             
             if ship_type in Ship.SIZES:
-                ship = Ship(x=int(x), y=int(y), type=ship_type, vertical=v)
+                ship = Ship(x=int(x), y=int(y), type=ship_type, vertical=(v == "v"))
                 ships.append(ship)
                 
         f.close()
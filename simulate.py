@@ -0,0 +1,83 @@
+'''
+Command-line entry point to play many headless games and report on the AI.
+
+Examples:
+    python simulate.py -n 1000
+    python simulate.py -n 1000 --ai montecarlo --fleet sample_configurations/sample_ship_config.txt
+    python simulate.py -n 10 --size 200 --ships 6,5,5,4,4,4,3,3,3,3,2,2,2,2,2
+'''
+
+from __future__ import print_function
+import argparse
+import time
+
+from headless_game import AI_CLASSES, load_fleet, play_games
+from rules import CLASSIC, Rules
+
+
+def percentile(values, p):
+    '''Return the <p>th percentile (0-100) of the sorted list <values>, by nearest rank.'''
+
+    if not values:
+        return float("nan")
+    i = int(round(p / 100.0 * (len(values) - 1)))
+    return values[i]
+
+
+def mean(values):
+    if not values:
+        return float("nan")
+    return float(sum(values)) / len(values)
+
+
+def report(results, elapsed):
+    '''Print statistics about the given list of GameResults, played in <elapsed> seconds.'''
+
+    shots_to_win = sorted(r.shots[r.winner] for r in results)
+    turn_times = sorted(t * 1000 for r in results for t in r.turn_times)
+    wins = [0, 0]
+    for r in results:
+        wins[r.winner] += 1
+
+    print("games:          {}".format(len(results)))
+    print("games/sec:      {:.1f}".format(len(results) / elapsed))
+    print("wins:           player 0: {}, player 1: {}".format(*wins))
+    print("shots to win:   mean {:.2f}, p50 {}, p90 {}, p99 {}".format(
+        mean(shots_to_win),
+        percentile(shots_to_win, 50),
+        percentile(shots_to_win, 90),
+        percentile(shots_to_win, 99)))
+    print("AI turn (ms):   mean {:.3f}, p50 {:.3f}, p90 {:.3f}, p99 {:.3f}, max {:.3f}".format(
+        mean(turn_times),
+        percentile(turn_times, 50),
+        percentile(turn_times, 90),
+        percentile(turn_times, 99),
+        percentile(turn_times, 100)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless games of battleship and report AI performance.")
+    parser.add_argument("-n", "--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--ai", choices=sorted(AI_CLASSES.keys()), default="density", help="AI strategy")
+    parser.add_argument("--fleet", help="ship configuration file for the opponent (default: AI vs AI)")
+    parser.add_argument("--seed", type=int, help="random seed")
+    parser.add_argument("--size", type=int, default=CLASSIC.size, help="side of the board (default: %(default)s)")
+    parser.add_argument("--ships", help="comma-separated lengths of the ships (default: classic fleet)")
+    args = parser.parse_args(argv)
+
+    if args.ships:
+        rules = Rules.generate(args.size, [int(length) for length in args.ships.split(",")])
+    else:
+        rules = Rules(args.size)
+
+    if args.fleet and rules != CLASSIC:
+        parser.error("--fleet only works with the classic rules")
+    fleet = load_fleet(args.fleet) if args.fleet else None
+
+    start = time.time()
+    results = list(play_games(args.games, AI_CLASSES[args.ai], fleet, args.seed, rules))
+    report(results, time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+'''
+Set of squares with constant-time removal and uniform random choice.
+'''
+
+import random
+
+
+class SquarePool(object):
+    '''Set of squares, kept in an array with a position index.
+    A square is removed by moving the last square of the array into its place.
+
+    Below are data representations:
+        * _squares:
+            the squares, in no particular order
+        * _positions:
+            maps square to its position in _squares
+    '''
+
+    def __init__(self, squares=()):
+        self._squares = []
+        self._positions = {}
+        for sq in squares:
+            self.add(sq)
+
+    def add(self, sq):
+        if sq not in self._positions:
+            self._positions[sq] = len(self._squares)
+            self._squares.append(sq)
+
+    def discard(self, sq):
+        '''Remove the square, if it is in the pool.'''
+
+        i = self._positions.pop(sq, None)
+        if i is not None:
+            last = self._squares.pop()
+            if i < len(self._squares):
+                self._squares[i] = last
+                self._positions[last] = i
+
+    def choice(self, rng=random):
+        '''Return a square chosen uniformly at random, or None if the pool is empty.
+        <rng> is the random.Random instance (or module) to use.'''
+
+        if not self._squares:
+            return None
+        return self._squares[int(rng.random() * len(self._squares))]
+
+    def __contains__(self, sq):
+        return sq in self._positions
+
+    def __iter__(self):
+        return iter(self._squares)
+
+    def __len__(self):
+        return len(self._squares)
@@ -0,0 +1,205 @@
+'''
+Parse-once cache of stat model files (such as ai/stat).
+
+A stat model file is parsed at most once per process. The values are also kept in a binary
+sidecar file next to it (<fname>.bin), which is memory-mapped by later processes instead of
+parsing the text again. The sidecar records the modification time and SHA-1 hash of the text
+file it was made from, and is rebuilt when the text file changes.
+'''
+
+import array
+import hashlib
+import mmap
+import os
+import struct
+
+from save_writer import replace_file
+
+SIDECAR_SUFFIX = ".bin"
+
+# magic, item size, board size, source mtime, source SHA-1
+HEADER = struct.Struct("=4sBHd20s")
+MAGIC = b"BSSM"
+
+
+class StatModel(object):
+    '''Immutable stat model: a square board of ints, indexed by (x, y) tuples.
+    <values> is a read-only buffer of the values, with (x, y) at x * size + y.'''
+
+    def __init__(self, values, size):
+        self._values = values
+        self.size = size
+
+    def __getitem__(self, sq):
+        return self._values[sq[0] * self.size + sq[1]]
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        return [(x, y) for x in range(self.size) for y in range(self.size)]
+
+    def items(self):
+        return [(sq, self[sq]) for sq in self.keys()]
+
+    def get_buffer(self):
+        '''Return the read-only buffer of values.'''
+
+        return self._values
+
+    def view(self):
+        '''Return a new copy-on-write view of this model.'''
+
+        return StatModelView(self)
+
+
+class StatModelView(object):
+    '''Mutable view of a StatModel. Reads go to the shared model until a square is written,
+    writes only go to this view.'''
+
+    def __init__(self, model):
+        self._model = model
+        self._overlay = {}
+
+    def __getitem__(self, sq):
+        if sq in self._overlay:
+            return self._overlay[sq]
+        return self._model[sq]
+
+    def __setitem__(self, sq, value):
+        self._overlay[sq] = value
+
+    def __contains__(self, sq):
+        return 0 <= sq[0] < self._model.size and 0 <= sq[1] < self._model.size
+
+    def __iter__(self):
+        return iter(self._model.keys())
+
+    def __len__(self):
+        return len(self._model)
+
+    def get(self, sq, default=None):
+        if sq in self:
+            return self[sq]
+        return default
+
+    def keys(self):
+        return self._model.keys()
+
+    def values(self):
+        return [self[sq] for sq in self.keys()]
+
+    def items(self):
+        return [(sq, self[sq]) for sq in self.keys()]
+
+
+def parse_stat_model(f):
+    '''Parse the text stat model in the open file <f>. Return (values, size).
+    Line x of the file holds the values of (x, 0), (x, 1), ...'''
+
+    rows = [[int(val) for val in line.split()] for line in f if line.strip()]
+    size = len(rows)
+    values = array.array("i", [0] * (size * size))
+
+    for x, row in enumerate(rows):
+        for y, val in enumerate(row):
+            values[x * size + y] = val
+
+    return values, size
+
+
+def _int_buffer(data, offset=0):
+    '''Return the native ints in the bytes of <data> from <offset> on, as a read-only buffer over <data>.
+    Python 2 has no memoryview.cast, so there the ints are copied to an array.'''
+
+    if hasattr(memoryview, "cast"):
+        return memoryview(data)[offset:].cast("i")
+
+    values = array.array("i")
+    values.fromstring(data[offset:])
+    return values
+
+
+def _to_bytes(values):
+    '''Return the bytes of the array <values>. Python 2 arrays have tostring instead of tobytes.'''
+
+    if hasattr(values, "tobytes"):
+        return values.tobytes()
+    return values.tostring()
+
+
+def _hash_file(fname):
+    with open(fname, "rb") as fp:
+        return hashlib.sha1(fp.read()).digest()
+
+
+def _read_sidecar(fname):
+    '''Return (mtime, digest, size, mapped buffer) of the sidecar file, or None if it is missing or invalid.'''
+
+    try:
+        with open(fname, "rb") as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if len(mm) < HEADER.size:
+        return None
+    magic, itemsize, size, mtime, digest = HEADER.unpack_from(mm)
+    if magic != MAGIC or itemsize != array.array("i").itemsize or len(mm) != HEADER.size + itemsize * size * size:
+        return None
+
+    return mtime, digest, size, _int_buffer(mm, HEADER.size)
+
+
+def _write_sidecar(fname, mtime, digest, values, size):
+    '''Write the sidecar file, atomically. Failing to write it is not an error.'''
+
+    tmp = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+        with open(tmp, "wb") as fp:
+            fp.write(HEADER.pack(MAGIC, values.itemsize, size, mtime, digest))
+            fp.write(_to_bytes(values))
+        replace_file(tmp, fname)
+    except (IOError, OSError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _load(fname):
+    '''Load the stat model in <fname>, through its sidecar if it is up to date.'''
+
+    mtime = os.stat(fname).st_mtime
+    sidecar_name = fname + SIDECAR_SUFFIX
+    sidecar = _read_sidecar(sidecar_name)
+
+    if sidecar is not None and sidecar[0] == mtime:
+        return StatModel(sidecar[3], sidecar[2])
+
+    digest = _hash_file(fname)
+    if sidecar is not None and sidecar[1] == digest:
+        # same contents, only the modification time changed
+        values = array.array("i", sidecar[3].tolist())
+        size = sidecar[2]
+    else:
+        with open(fname) as fp:
+            values, size = parse_stat_model(fp)
+
+    _write_sidecar(sidecar_name, mtime, digest, values, size)
+    return StatModel(_int_buffer(_to_bytes(values)), size)
+
+
+# maps real path of the text file to (mtime, StatModel)
+_models = {}
+
+
+def load_stat_model(fname):
+    '''Return the StatModel in the text file <fname>.
+    Models are loaded once per process, and again only if the file changes.'''
+
+    path = os.path.realpath(fname)
+    mtime = os.stat(path).st_mtime
+
+    if path not in _models or _models[path][0] != mtime:
+        _models[path] = (mtime, _load(path))
+
+    return _models[path][1]
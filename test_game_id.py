@@ -0,0 +1,83 @@
+'''
+Tests of the game ID allocator: IDs are never handed out twice, by threads or processes
+sharing one ID file.
+
+    python -m unittest test_game_id
+'''
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from game_id import GameIdAllocator
+
+IDS_PER_WORKER = 50
+
+
+def allocate_ids(args):
+    '''Return IDS_PER_WORKER new IDs from the file, with a fresh allocator. Runs in a worker process.'''
+
+    fname, block_size = args
+    allocator = GameIdAllocator(fname, block_size)
+    return [allocator.next_id() for i in range(IDS_PER_WORKER)]
+
+
+class GameIdAllocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, "game_id.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ids_increase(self):
+        allocator = GameIdAllocator(self.fname, block_size=4)
+        self.assertEqual([allocator.next_id() for i in range(10)], list(range(1, 11)))
+
+    def test_new_allocator_skips_reserved_ids(self):
+        allocator = GameIdAllocator(self.fname, block_size=4)
+        allocator.next_id()
+
+        # the rest of the first block is never handed out, as if the first process had crashed
+        self.assertEqual(GameIdAllocator(self.fname, block_size=4).next_id(), 5)
+
+    def test_threads(self):
+        allocator = GameIdAllocator(self.fname, block_size=3)
+        ids = []
+        lock = threading.Lock()
+
+        def run():
+            for i in range(IDS_PER_WORKER):
+                game_id = allocator.next_id()
+                with lock:
+                    ids.append(game_id)
+
+        threads = [threading.Thread(target=run) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(ids), list(range(1, 8 * IDS_PER_WORKER + 1)))
+
+    def test_processes(self):
+        workers = 8
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(allocate_ids, [(self.fname, block_size) for block_size in [1, 2, 3, 5, 1, 2, 3, 5]])
+        finally:
+            pool.close()
+            pool.join()
+
+        ids = [game_id for result in results for game_id in result]
+        self.assertEqual(len(set(ids)), workers * IDS_PER_WORKER)
+        for result in results:
+            self.assertEqual(result, sorted(result))
+
+
+if __name__ == "__main__":
+    unittest.main()
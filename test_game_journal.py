@@ -0,0 +1,141 @@
+'''
+Tests of the game journal: replay after a crash cut the last record short, and compaction,
+both synchronous and through a SaveWriter.
+
+    python -m unittest test_game_journal
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from game_journal import COMPACT_SUFFIX, GameJournal, read_records, replay
+from save_writer import SaveWriter
+from ship_model import Ship
+
+
+class GameJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, "game.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_game(self, journal, shots):
+        journal.start(7)
+        journal.place("human", "a", 0, 0, True)
+        journal.place("ai", "a", 5, 5, False)
+        for i in range(shots):
+            journal.shot("human", i % 10, i // 10, Ship.MISS)
+
+    def expected_shots(self, shots):
+        return [[i % 10, i // 10] for i in range(shots)]
+
+    def test_replay(self):
+        journal = GameJournal(self.fname)
+        self.write_game(journal, 3)
+        journal.end("human")
+        journal.close()
+
+        obj = replay(self.fname)["battleship"]
+        self.assertEqual(obj["game_id"], 7)
+        self.assertEqual(obj["human"]["ships"], {"a" : [0, 0, True]})
+        self.assertEqual(obj["ai"]["ships"], {"a" : [5, 5, False]})
+        # shots are listed under the grid shot at
+        self.assertEqual(obj["ai"]["shots"], self.expected_shots(3))
+        self.assertEqual(obj["human"]["shots"], [])
+
+    def test_torn_last_record_is_ignored(self):
+        journal = GameJournal(self.fname)
+        self.write_game(journal, 3)
+        journal.close()
+        with open(self.fname, "a") as fp:
+            fp.write('{"e":"shot","player":"hum')
+
+        self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(3))
+
+        # the game goes on after the torn record
+        journal = GameJournal(self.fname)
+        journal.shot("human", 3, 0, Ship.HIT)
+        journal.close()
+        self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(4))
+
+    def test_bad_record_before_the_last_raises(self):
+        journal = GameJournal(self.fname)
+        self.write_game(journal, 1)
+        journal.close()
+        with open(self.fname, "a") as fp:
+            fp.write('{"e":"sh\n{"e":"end","winner":"ai"}\n')
+
+        self.assertRaises(ValueError, replay, self.fname)
+
+    def test_compact(self):
+        journal = GameJournal(self.fname, compact_every=5)
+        self.write_game(journal, 10)
+        journal.close()
+
+        records = list(read_records(self.fname))
+        self.assertEqual(records[0]["e"], "snapshot")
+        self.assertLess(len(records), 5)
+        self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(10))
+
+    def test_compact_through_writer(self):
+        writer = SaveWriter(indent=4)
+        try:
+            journal = GameJournal(self.fname, compact_every=5, writer=writer)
+            self.write_game(journal, 2)
+
+            # the journal is complete while the snapshot is being written, and after
+            for shots in range(3, 20):
+                journal.shot("human", (shots - 1) % 10, (shots - 1) // 10, Ship.MISS)
+                self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(shots))
+                if shots % 4 == 0:
+                    writer.flush()
+                    writer.poll()
+            journal.close()
+            writer.flush()
+            writer.poll()
+        finally:
+            writer.close()
+
+        records = list(read_records(self.fname))
+        self.assertEqual(records[0]["e"], "snapshot")
+        self.assertTrue(all(r["e"] == "shot" for r in records[1:]))
+        self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(19))
+        self.assertFalse(os.path.exists(self.fname + COMPACT_SUFFIX))
+
+    def test_close_during_compaction_keeps_journal(self):
+        writer = SaveWriter()
+        try:
+            journal = GameJournal(self.fname, compact_every=5, writer=writer)
+            self.write_game(journal, 4)
+            with open(self.fname) as fp:
+                before = fp.read()
+            journal.close()
+            writer.flush()
+            writer.poll()
+        finally:
+            writer.close()
+
+        with open(self.fname) as fp:
+            self.assertEqual(fp.read(), before)
+        self.assertFalse(os.path.exists(self.fname + COMPACT_SUFFIX))
+
+    def test_snapshot_left_by_crash_is_removed(self):
+        journal = GameJournal(self.fname)
+        self.write_game(journal, 2)
+        journal.close()
+        with open(self.fname + COMPACT_SUFFIX, "w") as fp:
+            fp.write('{"e":"snapshot"')
+
+        journal = GameJournal(self.fname)
+        journal.close()
+        self.assertFalse(os.path.exists(self.fname + COMPACT_SUFFIX))
+        self.assertEqual(replay(self.fname)["battleship"]["ai"]["shots"], self.expected_shots(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
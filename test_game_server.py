@@ -0,0 +1,205 @@
+'''
+Tests of the game server's line protocol, with clients connected over TCP.
+Python 3 only, as is the server.
+
+    python -m unittest test_game_server
+'''
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from game_id import GameIdAllocator
+from game_server import MAX_LINE, GameServer
+from ship_model import Ship
+
+
+class Client(object):
+    '''A client of the server, speaking its protocol line by line.'''
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, *words):
+        self.writer.write((" ".join(str(word) for word in words) + "\n").encode("ascii"))
+
+    async def read(self):
+        '''Return the words of the next line, [] once the server has closed the connection.'''
+
+        line = await asyncio.wait_for(self.reader.readline(), 5)
+        return line.decode("ascii").split()
+
+    async def expect(self, *words):
+        '''Read the next line, which must start with <words>. Return all its words.'''
+
+        line = await self.read()
+        self.assertion.assertEqual(line[:len(words)], [str(word) for word in words])
+        return line
+
+    def close(self):
+        self.writer.close()
+
+
+class GameServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = GameServer(game_ids=GameIdAllocator(os.path.join(self.tmp_dir, "game_id.txt")))
+        self.listener = await self.server.start("localhost", 0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            client.close()
+        # let the server see the clients leave
+        await asyncio.sleep(0.05)
+        self.listener.close()
+        await self.listener.wait_closed()
+        shutil.rmtree(self.tmp_dir)
+
+    async def connect(self):
+        '''Connect a new client, and read the RULES line. Return the client.'''
+
+        client = Client(*(await asyncio.open_connection("localhost", self.port)))
+        client.assertion = self
+        self.clients.append(client)
+        words = await client.expect("RULES", 10)
+        client.fleet = [(ship.split(":")[0], int(ship.split(":")[1])) for ship in words[2].split(",")]
+        return client
+
+    async def place_fleet(self, client):
+        '''Place the ships of the client horizontally, one on every other row, and be ready.'''
+
+        for i, (ship, length) in enumerate(client.fleet):
+            client.send("PLACE", ship, 0, 2 * i, "h")
+            await client.expect("OK")
+        client.send("READY")
+        await client.expect("OK")
+
+    async def wait_for_matches(self, count):
+        '''Wait until the server has dropped the games left by their players.'''
+
+        for i in range(50):
+            if self.server.get_match_count() == count:
+                return
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.server.get_match_count(), count)
+
+    async def test_rules(self):
+        client = await self.connect()
+        self.assertEqual([ship for ship, length in client.fleet], Ship.SHORT_NAMES)
+        self.assertEqual([length for ship, length in client.fleet], [Ship.SIZES[ship] for ship in Ship.SHORT_NAMES])
+
+    async def test_game_against_ai(self):
+        client = await self.connect()
+        client.send("NEW", "AI")
+        game_id = int((await client.expect("GAME"))[1])
+        await self.place_fleet(client)
+        await client.expect("START", 0)
+
+        squares = [(x, y) for y in range(10) for x in range(10)]
+        shots = {0 : [], 1 : []}
+        hits = {0 : set(), 1 : set()}
+        my_turn = True
+        while True:
+            if my_turn:
+                client.send("SHOT", *squares.pop())
+            words = await client.read()
+            if words[0] == "OVER":
+                break
+            self.assertEqual(words[0], "SHOT")
+            player, x, y, result = [int(word) for word in words[1:5]]
+            shots[player].append((x, y))
+            if result != Ship.MISS:
+                hits[player].add((x, y))
+            self.assertEqual(len(words), 9 if result == Ship.SUNK else 5)
+            # a player shoots again after a hit
+            my_turn = (player == 0) == (result != Ship.MISS)
+
+        winner = int(words[1])
+        self.assertIn(winner, (0, 1))
+        for player in (0, 1):
+            self.assertEqual(len(set(shots[player])), len(shots[player]))
+        # the AI hit the fleet placed by place_fleet, and nothing else
+        fleet_squares = set((x, 2 * i) for i, (ship, length) in enumerate(client.fleet) for x in range(length))
+        self.assertTrue(hits[1] <= fleet_squares)
+        if winner == 1:
+            self.assertEqual(hits[1], fleet_squares)
+
+        client.send("QUIT")
+        self.assertEqual(await client.read(), [])
+        await self.wait_for_matches(0)
+        self.assertGreater(game_id, 0)
+
+    async def test_game_between_humans(self):
+        first = await self.connect()
+        first.send("NEW", "HUMAN")
+        game_id = (await first.expect("GAME"))[1]
+        second = await self.connect()
+        second.send("JOIN", game_id)
+        await second.expect("GAME", game_id, 1)
+        await first.expect("JOINED")
+
+        await self.place_fleet(first)
+        second.send("SHOT", 0, 0)
+        await second.expect("ERR")
+        await self.place_fleet(second)
+        await first.expect("START", 0)
+        await second.expect("START", 0)
+
+        second.send("SHOT", 0, 0)
+        await second.expect("ERR", "Not", "your", "turn")
+        first.send("SHOT", 9, 9)
+        await first.expect("SHOT", 0, 9, 9, Ship.MISS)
+        await second.expect("SHOT", 0, 9, 9, Ship.MISS)
+        second.send("SHOT", 0, 0)
+        await first.expect("SHOT", 1, 0, 0, Ship.HIT)
+        await second.expect("SHOT", 1, 0, 0, Ship.HIT)
+
+        # a third client cannot join
+        third = await self.connect()
+        third.send("JOIN", game_id)
+        await third.expect("ERR")
+
+        second.send("QUIT")
+        await first.expect("LEFT")
+        first.close()
+        await self.wait_for_matches(0)
+
+    async def test_bad_commands(self):
+        client = await self.connect()
+        for line in ["DANCE", "PLACE a 0 0 h", "SHOT 0 0", "READY", "JOIN 12345", "JOIN x", "NEW"]:
+            client.writer.write((line + "\n").encode("ascii"))
+            await client.expect("ERR")
+
+        client.send("NEW", "AI")
+        await client.expect("GAME")
+        for line in ["PLACE a 0 0 x", "PLACE a 0", "PLACE z 0 0 h", "PLACE a 9 9 v", "SHOT 0 0"]:
+            client.writer.write((line + "\n").encode("ascii"))
+            await client.expect("ERR")
+
+        # blank lines are ignored
+        client.writer.write(b"\n  \nPLACE a 0 0 h\n")
+        await client.expect("OK")
+
+    async def test_line_too_long(self):
+        client = await self.connect()
+        client.send("NEW", "AI")
+        await client.expect("GAME")
+        client.writer.write(b"X" * (MAX_LINE + 1) + b"\nPLACE a 0 0 h\n")
+
+        await client.expect("ERR", "Line", "too", "long")
+        try:
+            self.assertEqual(await client.read(), [])
+        except ConnectionError:
+            # the server closed the connection with the rest of the input unread
+            pass
+        await self.wait_for_matches(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+Regression test for loading a saved game: the AI's fleet must be the saved one,
+not a new fleet placed when the view is reset. Does not need a display.
+
+    python -m unittest test_load_restore
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ai_worker import AIWorker
+from battleship import GameController
+from grid_model import GridModel
+from ship_ai import ShipAI
+from ship_model import Ship
+
+
+class FakeGrid(object):
+    '''Stands in for ShipGrid: only its model is used.'''
+
+    def __init__(self):
+        self._model = GridModel()
+
+    def restore(self, ships, shots):
+        self._model.restore(ships, shots)
+
+
+class FakeGame(object):
+    '''Stands in for mock1.Game. Resetting it goes through the placing state, as the real one does,
+    which has the AI place a new fleet.'''
+
+    def __init__(self):
+        self.my_grid = FakeGrid()
+        self.their_grid = FakeGrid()
+        self.ai = ShipAI(self.their_grid._model, self.my_grid._model)
+
+    def reset(self):
+        self.ai.place_ships()
+
+    def redraw(self, tiles=True):
+        pass
+
+
+class LoadRestoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        controller = GameController.__new__(GameController)
+        controller.game_frame = FakeGame()
+        controller._ai_worker = AIWorker()
+        controller._ai_turn = 0
+        controller._ai_after_id = None
+        controller._ai_playing = False
+        controller._journal = None
+        controller._client = None
+        self.controller = controller
+
+        # a saved game, with each fleet placed by an AI
+        self.saved = {}
+        for player in GameController.PLAYERS:
+            grid = GridModel()
+            ShipAI(grid, GridModel()).place_ships()
+            ships = dict((name, list(p)) for name, p in grid.get_ship_placement().items())
+            # sink one ship, and hit another
+            shots = [list(sq) for sq in grid.get_ships()["a"].get_covering_squares()]
+            shots.append(list(grid.get_ships()["b"].coords()))
+            shots.append([sq for sq in grid.get_null_squares() if grid.get_ship_at(*sq) is None][0])
+            self.saved[player] = {"ships" : ships, "shots" : shots}
+
+    def tearDown(self):
+        self.controller._ai_worker.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self):
+        fname = os.path.join(self.tmp_dir, "saved.json")
+        with open(fname, "w") as f:
+            json.dump({"battleship" : self.saved}, f)
+        self.controller.load_callback(fname=fname, warn=False)
+
+    def test_fleets_are_the_saved_ones(self):
+        self.load()
+
+        grids = [self.controller.game_frame.my_grid._model, self.controller.game_frame.their_grid._model]
+        for grid, player in zip(grids, GameController.PLAYERS):
+            ships = self.saved[player]["ships"]
+            self.assertEqual(grid.get_ship_placement(), ships)
+
+            for x, y in self.saved[player]["shots"]:
+                if grid.get_state(x, y) in (Ship.HIT, Ship.SUNK):
+                    self.assertIsNotNone(grid.get_ship_at(x, y))
+            self.assertEqual(grid.get_sunk_ship(*ships["a"][:2]).get_short_name(), "a")
+            self.assertEqual(grid.get_state(*ships["b"][:2]), Ship.HIT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+'''
+Tests of the background save writer: the order of writes, coalescing of saves to the same file,
+errors reported through poll(), and atomic writes.
+
+    python -m unittest test_save_writer
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import save_writer
+from save_writer import SaveWriter, write_atomic
+
+
+class SaveWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.writer = SaveWriter()
+
+        # hold the writer thread inside write_atomic until released
+        self.written = []
+        self.release = threading.Event()
+        self._write_atomic = save_writer.write_atomic
+
+        def blocking_write_atomic(fname, data):
+            self.release.wait()
+            self._write_atomic(fname, data)
+            self.written.append(os.path.basename(fname))
+        save_writer.write_atomic = blocking_write_atomic
+
+    def tearDown(self):
+        self.release.set()
+        self.writer.close()
+        save_writer.write_atomic = self._write_atomic
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def read(self, name):
+        with open(self.path(name)) as fp:
+            return json.load(fp)
+
+    def test_files_are_written_in_order(self):
+        for name in ["c", "a", "b"]:
+            self.writer.save(self.path(name), {"name" : name})
+        self.release.set()
+        self.writer.flush()
+
+        self.assertEqual(self.written, ["c", "a", "b"])
+        for name in ["a", "b", "c"]:
+            self.assertEqual(self.read(name), {"name" : name})
+
+    def test_saves_to_same_file_are_coalesced(self):
+        errors = []
+        # the first save is taken by the thread, and held
+        self.writer.save(self.path("first"), {})
+        for i in range(3):
+            self.writer.save(self.path("a"), {"i" : i}, errors.append)
+        self.writer.save(self.path("b"), {})
+        self.release.set()
+        self.writer.flush()
+
+        self.assertEqual(self.written, ["first", "a", "b"])
+        self.assertEqual(self.read("a"), {"i" : 2})
+
+        # every callback is called, once the file is written
+        results = self.writer.poll()
+        self.assertEqual(errors, [None] * 3)
+        self.assertEqual(sorted(os.path.basename(fname) for fname, error in results), ["a", "b", "first"])
+        self.assertEqual(self.writer.poll(), [])
+
+    def test_compact(self):
+        writer = SaveWriter(indent=4)
+        try:
+            self.release.set()
+            writer.save(self.path("indented"), {"a" : [1, 2]})
+            writer.save(self.path("compact"), {"a" : [1, 2]}, compact=True)
+            writer.flush()
+        finally:
+            writer.close()
+
+        with open(self.path("compact")) as fp:
+            self.assertEqual(fp.read(), '{"a":[1,2]}')
+        with open(self.path("indented")) as fp:
+            self.assertEqual(len(fp.read().split("\n")), 6)
+
+    def test_error_is_reported(self):
+        errors = []
+        self.release.set()
+        # a directory cannot be replaced by a file
+        os.mkdir(self.path("dir"))
+        self.writer.save(self.path("dir"), {}, errors.append)
+        self.writer.flush()
+
+        results = self.writer.poll()
+        self.assertEqual(len(results), 1)
+        self.assertIsNotNone(results[0][1])
+        self.assertEqual(errors, [results[0][1]])
+
+    def test_close_writes_pending_saves(self):
+        for name in ["a", "b"]:
+            self.writer.save(self.path(name), {"name" : name})
+        self.release.set()
+        self.writer.close()
+
+        self.assertEqual(self.written, ["a", "b"])
+
+
+class WriteAtomicTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_replaces_file(self):
+        fname = os.path.join(self.tmp_dir, "sub", "file.json")
+        write_atomic(fname, "old")
+        write_atomic(fname, "new")
+
+        with open(fname) as fp:
+            self.assertEqual(fp.read(), "new")
+        self.assertEqual(os.listdir(os.path.dirname(fname)), ["file.json"])
+
+    def test_failed_write_keeps_file(self):
+        fname = os.path.join(self.tmp_dir, "file.json")
+        write_atomic(fname, "old")
+
+        # not a string: fails half way through writing the temporary file
+        self.assertRaises(TypeError, write_atomic, fname, 1)
+
+        with open(fname) as fp:
+            self.assertEqual(fp.read(), "old")
+        self.assertEqual(os.listdir(self.tmp_dir), ["file.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
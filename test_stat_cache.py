@@ -0,0 +1,118 @@
+'''
+Tests of the stat model cache: the binary sidecar is written on the first load, used on later
+loads, and rebuilt when the text file changes.
+
+    python -m unittest test_stat_cache
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import stat_cache
+from stat_cache import SIDECAR_SUFFIX, load_stat_model
+
+
+def write_model(fname, rows):
+    with open(fname, "w") as fp:
+        for row in rows:
+            fp.write(" ".join(str(val) for val in row) + "\n")
+
+
+def set_mtime(fname, mtime):
+    os.utime(fname, (mtime, mtime))
+
+
+class StatCacheTest(unittest.TestCase):
+
+    ROWS = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, "stat")
+        write_model(self.fname, self.ROWS)
+        set_mtime(self.fname, 1000000000)
+
+        # count the text files parsed
+        self.parsed = 0
+        self._parse_stat_model = stat_cache.parse_stat_model
+
+        def counting_parse_stat_model(f):
+            self.parsed += 1
+            return self._parse_stat_model(f)
+        stat_cache.parse_stat_model = counting_parse_stat_model
+
+    def tearDown(self):
+        stat_cache.parse_stat_model = self._parse_stat_model
+        stat_cache._models.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self):
+        '''Load the model as a new process would.'''
+
+        stat_cache._models.clear()
+        return load_stat_model(self.fname)
+
+    def assertModel(self, model, rows):
+        self.assertEqual(model.size, len(rows))
+        self.assertEqual(dict(model.items()), dict(((x, y), val) for x, row in enumerate(rows) for y, val in enumerate(row)))
+
+    def test_sidecar_round_trip(self):
+        self.assertModel(self.load(), self.ROWS)
+        self.assertEqual(self.parsed, 1)
+        self.assertTrue(os.path.exists(self.fname + SIDECAR_SUFFIX))
+
+        self.assertModel(self.load(), self.ROWS)
+        self.assertEqual(self.parsed, 1)
+
+    def test_loaded_once_per_process(self):
+        model = load_stat_model(self.fname)
+        self.assertIs(load_stat_model(self.fname), model)
+        self.assertEqual(self.parsed, 1)
+
+    def test_changed_file_invalidates_sidecar(self):
+        self.load()
+        rows = [[9, 8, 7], [6, 5, 4], [3, 2, 1]]
+        write_model(self.fname, rows)
+        set_mtime(self.fname, 1000000001)
+
+        # in this process too
+        self.assertModel(load_stat_model(self.fname), rows)
+        self.assertEqual(self.parsed, 2)
+        self.assertModel(self.load(), rows)
+        self.assertEqual(self.parsed, 2)
+
+    def test_touched_file_keeps_sidecar_values(self):
+        self.load()
+        set_mtime(self.fname, 1000000002)
+
+        self.assertModel(self.load(), self.ROWS)
+        self.assertEqual(self.parsed, 1)
+        # the sidecar now records the new modification time
+        self.assertEqual(stat_cache._read_sidecar(self.fname + SIDECAR_SUFFIX)[0], 1000000002)
+
+    def test_bad_sidecar_is_rebuilt(self):
+        self.load()
+        for data in [b"", b"BSSM", b"XXXX" + b"\0" * 100]:
+            with open(self.fname + SIDECAR_SUFFIX, "wb") as fp:
+                fp.write(data)
+            parsed = self.parsed
+
+            self.assertModel(self.load(), self.ROWS)
+            self.assertEqual(self.parsed, parsed + 1)
+            self.assertIsNotNone(stat_cache._read_sidecar(self.fname + SIDECAR_SUFFIX))
+
+    def test_view_does_not_change_model(self):
+        model = self.load()
+        view = model.view()
+        view[(0, 0)] = 100
+
+        self.assertEqual(view[(0, 0)], 100)
+        self.assertEqual(view[(1, 1)], 5)
+        self.assertEqual(model[(0, 0)], 1)
+        self.assertEqual(model.view()[(0, 0)], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+'''
+Play a large number of headless games between two AIs, spread across a process pool.
+
+Every game gets a seed derived from the tournament seed and the game's number, so a run
+gives the same results whatever the number of workers. (This does not hold for AIs whose
+play depends on the clock, such as MonteCarloShipAI with a time budget.)
+
+Examples:
+    python tournament.py -n 1000000 --ai density --opponent numpy
+    python tournament.py -n 100000 -j 32 --seed 7 -o results.json
+'''
+
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from grid_model import GridModel
+from headless_game import AI_CLASSES, HeadlessGame, load_fleet
+
+
+def game_seed(seed, game):
+    '''Return the seed of game number <game> in a tournament seeded with <seed>.'''
+
+    return (seed << 32) + game
+
+
+class TournamentStats(object):
+    '''Aggregate statistics over many games.
+
+    Below are data representations:
+        * wins:
+            number of games won by each player
+        * shots_to_win:
+            for each player, maps the number of shots the player took to win to the number of such games
+        * hits:
+            for each player, SIZE x SIZE table (indexed [x][y]) of how often they hit each square
+    '''
+
+    def __init__(self):
+        self.games = 0
+        self.wins = [0, 0]
+        self.shots_to_win = [{}, {}]
+        self.hits = [[[0] * GridModel.SIZE for x in range(GridModel.SIZE)] for player in range(2)]
+
+    def add_result(self, result):
+        '''Add the GameResult of one game.'''
+
+        self.games += 1
+        self.wins[result.winner] += 1
+
+        histogram = self.shots_to_win[result.winner]
+        shots = result.shots[result.winner]
+        histogram[shots] = histogram.get(shots, 0) + 1
+
+        for player, squares in enumerate(result.hits):
+            for x, y in squares:
+                self.hits[player][x][y] += 1
+
+    def merge(self, other):
+        '''Add the statistics of <other> to these.'''
+
+        self.games += other.games
+        for player in range(2):
+            self.wins[player] += other.wins[player]
+            for shots, count in other.shots_to_win[player].items():
+                self.shots_to_win[player][shots] = self.shots_to_win[player].get(shots, 0) + count
+            for x in range(GridModel.SIZE):
+                for y in range(GridModel.SIZE):
+                    self.hits[player][x][y] += other.hits[player][x][y]
+
+    def win_rate(self, player=0):
+        if self.games == 0:
+            return float("nan")
+        return float(self.wins[player]) / self.games
+
+    def to_json(self):
+        '''Return a JSON-serializable dictionary of these statistics.'''
+
+        return {
+            "games" : self.games,
+            "wins" : self.wins,
+            "win_rate" : self.win_rate(),
+            "shots_to_win" : [{str(k): v for k, v in sorted(h.items())} for h in self.shots_to_win],
+            "hits" : self.hits
+        }
+
+
+def play_chunk(args):
+    '''Play the games numbered [start, end) of a tournament. Return their TournamentStats.
+    Runs in a worker process.'''
+
+    start, end, seed, ai_name, opponent_name, fleet = args
+    stats = TournamentStats()
+
+    for game in range(start, end):
+        random.seed(game_seed(seed, game))
+        g = HeadlessGame(AI_CLASSES[ai_name], fleet, opponent_class=AI_CLASSES[opponent_name])
+        # take turns going first
+        stats.add_result(g.play(first_player=game % 2))
+
+    return stats
+
+
+def run_tournament(games, ai_name="density", opponent_name="density", fleet=None, seed=0, workers=None, chunk_size=1000, callback=None):
+    '''Play <games> games across <workers> processes (one per core by default).
+    <callback>, if given, is called with the running TournamentStats every time a chunk comes back.
+    Return the final TournamentStats.'''
+
+    chunks = [(start, min(start + chunk_size, games), seed, ai_name, opponent_name, fleet)
+              for start in range(0, games, chunk_size)]
+    stats = TournamentStats()
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for chunk_stats in pool.imap_unordered(play_chunk, chunks):
+            stats.merge(chunk_stats)
+            if callback is not None:
+                callback(stats)
+    finally:
+        pool.close()
+        pool.join()
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a tournament of headless battleship games across many processes.")
+    parser.add_argument("-n", "--games", type=int, default=10000, help="number of games to play")
+    parser.add_argument("--ai", choices=sorted(AI_CLASSES.keys()), default="density", help="AI strategy of player 0")
+    parser.add_argument("--opponent", choices=sorted(AI_CLASSES.keys()), default="density", help="AI strategy of player 1")
+    parser.add_argument("--fleet", help="ship configuration file for player 1 (player 1 does not shoot)")
+    parser.add_argument("--seed", type=int, default=0, help="tournament seed")
+    parser.add_argument("-j", "--workers", type=int, help="number of worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="number of games per chunk")
+    parser.add_argument("-o", "--output", help="write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    fleet = load_fleet(args.fleet) if args.fleet else None
+    start = time.time()
+
+    def progress(stats):
+        elapsed = time.time() - start
+        print("{} / {} games, {:.0f} games/sec, player 0 win rate {:.4f}".format(
+            stats.games, args.games, stats.games / elapsed, stats.win_rate()))
+
+    stats = run_tournament(args.games, args.ai, args.opponent, fleet, args.seed, args.workers, args.chunk_size, progress)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(stats.to_json(), fp, separators=(',', ':'))
+
+
+if __name__ == "__main__":
+    main()